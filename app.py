@@ -1,10 +1,11 @@
 import streamlit as st
 from datetime import datetime
 import requests
+import json
+import time
 import os
 import cachetools
 from dotenv import load_dotenv
-from utils.pdf_utils import get_page_count
 
 # Page configuration
 st.set_page_config(
@@ -16,6 +17,28 @@ st.set_page_config(
 load_dotenv()
 BACKEND_URL = os.getenv("BACKEND_URL")
 
+def stream_answer(response, placeholder):
+    """Render a /chat/stream Server-Sent Events response token by token."""
+    answer, sources, error = "", [], None
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: "):])
+            if event == "sources":
+                sources = sorted(set(data["sources"]))
+            elif event == "token":
+                answer += data["text"]
+                placeholder.markdown(f"🤖 {answer}▌")
+            elif event in ("replace", "done"):
+                answer = data["answer"]
+                sources = sorted(set(data["sources"]))
+            elif event == "error":
+                error = data["detail"]
+    placeholder.empty()
+    return answer, sources, error
+
 # --- Wake up backend on app load ---
 if "backend_wakeup_triggered" not in st.session_state:
     st.session_state.backend_wakeup_triggered = False
@@ -225,8 +248,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state
-if "pdf_bytes" not in st.session_state:
-    st.session_state.pdf_bytes = None
+if "filename" not in st.session_state:
     st.session_state.filename = None
     st.session_state.pdf_processed = False
     st.session_state.show_chat = False
@@ -250,7 +272,6 @@ with st.sidebar:
 
     if uploaded_file:
         if st.session_state.filename != uploaded_file.name:
-            st.session_state.pdf_bytes = uploaded_file.read()
             st.session_state.filename = uploaded_file.name
             st.session_state.pdf_processed = False
             st.session_state.show_chat = False
@@ -258,16 +279,37 @@ with st.sidebar:
             st.session_state.name_prompted = False
             st.session_state.user_name = ""
             st.session_state.input_value = ""
-            st.session_state.total_pages = get_page_count(st.session_state.pdf_bytes)
 
         if not st.session_state.pdf_processed:
             with st.spinner("Processing PDF..."):
                 try:
-                    files = {"file": (uploaded_file.name, st.session_state.pdf_bytes, "application/pdf")}
-                    response = requests.post(f"{os.environ['BACKEND_URL']}/upload", files=files)
-                    if response.status_code == 200:
-                        st.session_state.pdf_processed = True
-                        st.success(f"✅ Loaded {st.session_state.total_pages} pages!")
+                    # Streamed raw from Streamlit's upload buffer (no multipart copy); the backend counts the pages
+                    uploaded_file.seek(0)
+                    response = requests.post(
+                        f"{os.environ['BACKEND_URL']}/upload",
+                        params={"filename": uploaded_file.name},
+                        data=uploaded_file,
+                        headers={"Content-Type": "application/pdf"},
+                    )
+                    if response.status_code in (200, 202):
+                        st.session_state.total_pages = response.json()["pages"]
+                        status_url = f"{os.environ['BACKEND_URL']}{response.json()['status_url']}"
+                        progress = st.progress(0.0, text="Indexing pages...")
+                        while True:
+                            job = requests.get(status_url, timeout=10).json()
+                            if job["status"] in ("ready", "failed"):
+                                break
+                            eta = f" (about {job['eta_seconds']:.0f}s left)" if job.get("eta_seconds") else ""
+                            if job["pages_total"]:
+                                done = job["pages_indexed"] / job["pages_total"]
+                                progress.progress(done, text=f"Indexing pages {job['pages_indexed']}/{job['pages_total']}{eta}")
+                            time.sleep(0.5)
+                        progress.empty()
+                        if job["status"] == "ready":
+                            st.session_state.pdf_processed = True
+                            st.success(f"✅ Loaded {st.session_state.total_pages} pages!")
+                        else:
+                            st.error(f"Backend Error: {job['error']}")
                     else:
                         st.error(f"Backend Error: {response.text}")
                 except (requests.RequestException, KeyError):
@@ -372,28 +414,30 @@ if uploaded_file and st.session_state.pdf_processed:
                 if send_button and query:
                     st.session_state.chat_history.append({"role": "user", "content": query})
                     
-                    with st.spinner("Thinking..."):
-                        try:
-                            payload = {
-                                "question": query,
-                                "filename": st.session_state.filename,
-                                "start_page": st.session_state.start_page,
-                                "end_page": st.session_state.end_page
-                            }
-                            response = requests.post(f"{os.environ['BACKEND_URL']}/chat", json=payload)
-                            if response.status_code == 200:
-                                data = response.json()
-                                answer = data["answer"]
-                                sources = sorted(list(set(data["sources"])))
+                    answer_placeholder = st.empty()
+                    try:
+                        payload = {
+                            "question": query,
+                            "filename": st.session_state.filename,
+                            "start_page": st.session_state.start_page,
+                            "end_page": st.session_state.end_page
+                        }
+                        with st.spinner("Thinking..."):
+                            response = requests.post(f"{os.environ['BACKEND_URL']}/chat/stream", json=payload, stream=True)
+                        if response.status_code == 200:
+                            answer, sources, error = stream_answer(response, answer_placeholder)
+                            if error:
+                                st.session_state.chat_history.append({"role": "assistant", "content": f"❌ Error: {error}"})
+                            else:
                                 sources_text = ", ".join(map(str, sources)) if sources else "N/A"
                                 full_response = f"{answer}<br><br><small>📄 Sources: Page {sources_text}</small>"
                                 st.session_state.chat_history.append({"role": "assistant", "content": full_response})
-                            else:
-                                error_msg = f"❌ Error: {response.text}"
-                                st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
-                        except (requests.RequestException, KeyError) as e:
-                            error_msg = f"❌ Connection error: {str(e)}"
+                        else:
+                            error_msg = f"❌ Error: {response.text}"
                             st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+                    except (requests.RequestException, KeyError) as e:
+                        error_msg = f"❌ Connection error: {str(e)}"
+                        st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
                     
                     st.rerun()
 
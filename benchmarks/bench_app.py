@@ -0,0 +1,200 @@
+"""
+End-to-end benchmark: ingest and query throughput of the FastAPI app, run
+in-process (httpx over ASGI) on synthetic PDFs with the fake LLM, so it
+needs no network, no API key and no running server.
+
+The ingest phase uploads --docs PDFs of --pages pages each and waits until
+all are indexed (pages/s, chunks/s, mean stage times). The query phase then
+sends --queries questions to /chat at each --concurrency level (req/s and
+p50/p95/p99 latency). Indexes and the embedding cache go to a fresh temp
+directory and the answer cache is bypassed, so every run starts cold and
+every question goes through the whole pipeline.
+
+    python -m benchmarks.bench_app --docs 4 --pages 50 --concurrency 1,4,16 --json app.json
+"""
+import argparse
+import asyncio
+import hashlib
+import tempfile
+import json
+import time
+import os
+
+import numpy as np
+
+from benchmarks.synthetic_pdf import WORDS, make_pdf
+
+
+class HashEmbeddingModel:
+    """Deterministic random unit vectors per text; isolates the app from model speed."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False):
+        vectors = np.empty((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def configure_environment(workdir: str, llm_latency_ms: float):
+    """Settings for a cold, offline, unthrottled run; must happen before `main` is imported."""
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["INDEX_STORE_DIR"] = os.path.join(workdir, "index_store")
+    os.environ["EMBEDDING_CACHE_DIR"] = os.path.join(workdir, "embedding_cache")
+    os.environ["ANSWER_CACHE_THRESHOLD"] = "2"  # cosine similarity never reaches it
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(llm_latency_ms)
+    os.environ.setdefault("FAKE_LLM_JITTER_MS", "0")
+    os.environ.setdefault("FAKE_LLM_TOKENS_PER_SECOND", "0")
+    os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+    os.environ.setdefault("LLM_MAX_CONCURRENCY", "256")
+
+
+def percentile(values, q: float):
+    return round(float(np.percentile(np.array(values), q)), 2) if values else None
+
+
+async def run_ingest(client, docs: int, pages: int, words_per_page: int) -> dict:
+    pdfs = [make_pdf(pages, words_per_page=words_per_page, seed=seed) for seed in range(docs)]
+    start = time.perf_counter()
+    uploads = await asyncio.gather(*(
+        client.post("/upload", files={"file": (f"bench_{i}.pdf", pdf, "application/pdf")})
+        for i, pdf in enumerate(pdfs)
+    ))
+    jobs = []
+    for upload in uploads:
+        upload.raise_for_status()
+        status_url = upload.json()["status_url"]
+        while True:
+            job = (await client.get(status_url)).json()
+            if job["status"] in ("ready", "failed"):
+                break
+            await asyncio.sleep(0.01)
+        if job["status"] == "failed":
+            raise RuntimeError(f"Ingest failed for {job['filename']}: {job['error']}")
+        jobs.append(job)
+    elapsed = time.perf_counter() - start
+
+    chunks = sum(job["chunks_embedded"] for job in jobs)
+    stages = sorted({stage for job in jobs for stage in job["timings"]})
+    return {
+        "docs": docs,
+        "pages": docs * pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(docs * pages / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 2),
+        "mean_stage_ms": {
+            stage: round(sum(job["timings"].get(stage, 0.0) for job in jobs) / len(jobs), 2) for stage in stages
+        },
+    }
+
+
+async def run_queries(client, filenames, pages: int, queries: int, concurrency: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    questions = [
+        " ".join(rng.choice(WORDS, size=6)) + f" for part P-{rng.integers(1000, 10000)}?" for _ in range(queries)
+    ]
+    latencies, stage_totals = [], {}
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < queries:
+            i = next_index
+            next_index += 1
+            request = {"question": questions[i], "filename": filenames[i % len(filenames)], "start_page": 0, "end_page": pages}
+            start = time.perf_counter()
+            response = await client.post("/chat", json=request)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+                continue
+            for stage, value in response.json()["timings"].items():
+                if stage.endswith("_ms"):
+                    stage_totals[stage] = stage_totals.get(stage, 0.0) + value
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    answered = queries - errors
+    return {
+        "concurrency": concurrency,
+        "queries": queries,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(queries / elapsed, 2),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_stage_ms": {stage: round(total / answered, 2) for stage, total in sorted(stage_totals.items())} if answered else {},
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import main as app_module
+    from rag_pipeline.embeddings import get_embeddings
+
+    if args.fake_embeddings:
+        get_embeddings()._model = HashEmbeddingModel()
+    app = app_module.app
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            ingest = await run_ingest(client, args.docs, args.pages, args.words_per_page)
+            filenames = [f"bench_{i}.pdf" for i in range(args.docs)]
+            # One untimed request per document loads anything still lazy
+            for filename in filenames:
+                await client.post("/chat", json={"question": "warm up", "filename": filename, "start_page": 0, "end_page": 0})
+            query = [
+                await run_queries(client, filenames, args.pages, args.queries, concurrency, seed)
+                for seed, concurrency in enumerate(args.concurrency)
+            ]
+    return {"ingest": ingest, "query": query}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--words-per-page", type=int, default=350)
+    parser.add_argument("--queries", type=int, default=200, help="Questions per concurrency level")
+    parser.add_argument(
+        "--concurrency", type=lambda value: [int(c) for c in value.split(",")], default=[1, 4, 16, 64],
+        help="Comma-separated concurrency levels",
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="Fake LLM time to answer")
+    parser.add_argument(
+        "--fake-embeddings", action="store_true",
+        help="Hash texts to random vectors instead of running the embedding model",
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        configure_environment(workdir, args.llm_latency_ms)
+        results = asyncio.run(run(args))
+
+    ingest = results["ingest"]
+    print(
+        f"Ingest: {ingest['docs']} docs, {ingest['pages']} pages, {ingest['chunks']} chunks in {ingest['seconds']:.2f}s "
+        f"-> {ingest['pages_per_second']:.1f} pages/s, {ingest['chunks_per_second']:.1f} chunks/s"
+    )
+    print(f"        stages (mean ms per doc): {ingest['mean_stage_ms']}")
+    for level in results["query"]:
+        print(
+            f"Query c={level['concurrency']:>3}: {level['requests_per_second']:>7.1f} req/s  "
+            f"p50 {level['p50_ms']:.1f} ms  p95 {level['p95_ms']:.1f} ms  p99 {level['p99_ms']:.1f} ms  "
+            f"errors {level['errors']}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": {key: value for key, value in vars(args).items() if key != "json"}, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
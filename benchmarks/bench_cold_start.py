@@ -0,0 +1,138 @@
+"""
+Benchmark: where the API's cold start goes. Imports `main` in a fresh
+interpreter with `-X importtime` and reports the total import time, the
+first-party modules and the slowest third-party packages (self time summed
+per top-level package). With --serve it also starts uvicorn and measures
+the time until `GET /` answers and until `GET /ready` reports ready.
+
+    python -m benchmarks.bench_cold_start --serve --json cold_start.json
+"""
+import subprocess
+import argparse
+import socket
+import json
+import time
+import sys
+
+import requests
+
+FIRST_PARTY = ("main", "rag_pipeline", "utils")
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module, self_us, cumulative_us) per `import time:` line, in import order."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_part, cumulative_us, name = line.split("|")
+        modules.append((name.strip(), int(self_part.split(":")[1]), int(cumulative_us)))
+    return modules
+
+
+def measure_imports(top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True, check=True
+    )
+    modules = parse_importtime(result.stderr)
+    main_us = next(cumulative for name, _, cumulative in modules if name == "main")
+    first_party = sorted(
+        ({"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative / 1000}
+         for name, self_us, cumulative in modules if name.split(".")[0] in FIRST_PARTY),
+        key=lambda m: -m["cumulative_ms"],
+    )
+    packages: dict = {}
+    for name, self_us, _ in modules:
+        package = name.split(".")[0]
+        if package not in FIRST_PARTY:
+            packages[package] = packages.get(package, 0) + self_us
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return {
+        "import_main_ms": round(main_us / 1000, 1),
+        "modules_imported": len(modules),
+        "first_party": [{key: round(v, 1) if isinstance(v, float) else v for key, v in m.items()} for m in first_party],
+        "third_party_self_ms": {package: round(us / 1000, 1) for package, us in slowest},
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float, accept=lambda response: response.ok):
+    while time.monotonic() < deadline:
+        try:
+            if accept(requests.get(url, timeout=1)):
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def measure_server(timeout: float) -> dict:
+    port = free_port()
+    start = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        base = f"http://127.0.0.1:{port}"
+        healthy = wait_for(f"{base}/", deadline)
+        health_seconds = time.monotonic() - start
+        # Stop early once a required component failed: the service will not become ready
+        settled = lambda response: response.ok or any(
+            c["required"] and c["status"] == "failed" for c in response.json()["components"].values()
+        )
+        healthy and wait_for(f"{base}/ready", deadline, accept=settled)
+        ready_seconds = time.monotonic() - start
+        status = requests.get(f"{base}/ready", timeout=5) if healthy else None
+        ready = status is not None and status.ok
+        components = status.json()["components"] if status is not None else {}
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "health_seconds": round(health_seconds, 3) if healthy else None,
+        "ready_seconds": round(ready_seconds, 3) if ready else None,
+        "components": components,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Third-party packages to list")
+    parser.add_argument("--serve", action="store_true", help="Also time uvicorn until / and /ready answer")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = {"imports": measure_imports(args.top)}
+    imports = results["imports"]
+    print(f"import main: {imports['import_main_ms']:.0f} ms ({imports['modules_imported']} modules)")
+    print("First-party modules (cumulative / self ms):")
+    for m in imports["first_party"]:
+        print(f"  {m['module']:<36} {m['cumulative_ms']:>8.1f} {m['self_ms']:>8.1f}")
+    print("Slowest third-party packages (self ms):")
+    for package, ms in imports["third_party_self_ms"].items():
+        print(f"  {package:<36} {ms:>8.1f}")
+
+    if args.serve:
+        results["server"] = server = measure_server(args.timeout)
+        for endpoint, key in (("/", "health_seconds"), ("/ready", "ready_seconds")):
+            seconds = server[key]
+            print(f"GET {endpoint:<6} ready after {seconds:.2f}s" if seconds is not None else f"GET {endpoint:<6} never ready")
+        for name, component in server["components"].items():
+            seconds = f"{component['seconds']:.2f}s" if component["seconds"] is not None else "-"
+            print(f"  {name:<12} {component['status']:<8} {seconds}  {component['error'] or ''}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: embedding throughput of the torch model against its ONNX exports
+(fp32 and int8, with and without length-bucketed batching), plus the cosine
+similarity of each ONNX variant to the torch vectors. The texts are real
+chunks from the splitter over a synthetic PDF, so lengths vary as in ingest.
+Export the ONNX models first with `python -m rag_pipeline.onnx_embeddings`.
+
+    python -m benchmarks.bench_embedding_backends --chunks 2000 --json embeddings.json
+"""
+import argparse
+import json
+import time
+import os
+
+import numpy as np
+
+from benchmarks.synthetic_pdf import make_pdf
+from rag_pipeline.embeddings import EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL_PATH
+from rag_pipeline.onnx_embeddings import EMBEDDING_ONNX_MIN_COSINE, EMBEDDING_ONNX_PATH, OnnxEmbeddingModel
+from utils.document_loader import iter_chunks
+
+
+def synthetic_chunks(count: int) -> list:
+    texts, seed = [], 0
+    while len(texts) < count:
+        texts.extend(chunk.page_content for chunk in iter_chunks(make_pdf(50, seed=seed), f"bench_{seed}.pdf"))
+        seed += 1
+    return texts[:count]
+
+
+def timed_encode(model, texts: list, batch_size: int):
+    model.encode(texts[:batch_size], batch_size=batch_size, normalize_embeddings=True)  # warm-up
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return np.asarray(vectors), time.perf_counter() - start
+
+
+def run(num_chunks: int, batch_size: int, onnx_dir: str, num_threads: int) -> dict:
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    texts = synthetic_chunks(num_chunks)
+    reference, seconds = timed_encode(SentenceTransformer(EMBEDDING_MODEL_PATH, device="cpu"), texts, batch_size)
+    results = {"torch": {"chunks_per_second": round(len(texts) / seconds, 1)}}
+
+    for file_name in ("model.onnx", "model_int8.onnx"):
+        model_file = os.path.join(onnx_dir, file_name)
+        if not os.path.exists(model_file):
+            print(f"Skipping {model_file} (not exported)")
+            continue
+        for sort_by_length in (False, True):
+            model = OnnxEmbeddingModel(model_file, num_threads=num_threads, sort_by_length=sort_by_length)
+            vectors, seconds = timed_encode(model, texts, batch_size)
+            cosines = (reference * vectors).sum(axis=1)
+            name = f"onnx_{'int8' if 'int8' in file_name else 'fp32'}{'_bucketed' if sort_by_length else ''}"
+            results[name] = {
+                "chunks_per_second": round(len(texts) / seconds, 1),
+                "padding_ratio": model.padding_ratio(),
+                "min_cosine": round(float(cosines.min()), 5),
+                "mean_cosine": round(float(cosines.mean()), 5),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--onnx-dir", default=os.path.dirname(EMBEDDING_ONNX_PATH))
+    parser.add_argument("--num-threads", type=int, default=0, help="0 = library default")
+    parser.add_argument("--min-cosine", type=float, default=EMBEDDING_ONNX_MIN_COSINE)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.chunks, args.batch_size, args.onnx_dir, args.num_threads)
+    baseline = results["torch"]["chunks_per_second"]
+    failed = []
+    for name, r in results.items():
+        line = f"{name:>20}: {r['chunks_per_second']:>8.1f} chunks/s ({r['chunks_per_second'] / baseline:.2f}x)"
+        if "min_cosine" in r:
+            line += f"  padding {r['padding_ratio']:.1%}  cosine min {r['min_cosine']:.4f} mean {r['mean_cosine']:.4f}"
+            if r["min_cosine"] < args.min_cosine:
+                failed.append(name)
+        print(line)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"chunks": args.chunks, "batch_size": args.batch_size, "results": results}, f, indent=2)
+    if failed:
+        raise SystemExit(f"Below the {args.min_cosine} cosine parity threshold: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: recall@k, query latency and memory of each FAISS index type in
+rag_pipeline/index_factory.py against the exact flat baseline, on synthetic
+clustered unit vectors shaped like MiniLM embeddings.
+
+    python -m benchmarks.bench_index_types --vectors 50000 --queries 200
+"""
+import numpy as np
+import argparse
+import json
+import time
+import faiss
+
+from rag_pipeline.index_factory import INDEX_TYPES, build_faiss_index
+
+DIM = 384
+
+
+def synthetic_vectors(count: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors scattered around random cluster centres."""
+    centres = rng.standard_normal((clusters, DIM)).astype("float32")
+    vectors = centres[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, DIM)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def run(num_vectors: int, num_queries: int, k: int) -> dict:
+    rng = np.random.default_rng(0)
+    vectors = synthetic_vectors(num_vectors, max(8, num_vectors // 500), rng)
+    queries = vectors[rng.choice(num_vectors, num_queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+
+    results = {}
+    baseline = None
+    for index_type in INDEX_TYPES:
+        start = time.perf_counter()
+        index = build_faiss_index(vectors, index_type)
+        build_seconds = time.perf_counter() - start
+
+        # One query per call, like /chat
+        found = np.empty((num_queries, k), dtype=np.int64)
+        start = time.perf_counter()
+        for i in range(num_queries):
+            _, found[i] = index.search(queries[i:i + 1], k)
+        latency_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+        if baseline is None:
+            baseline = found
+        recall = np.mean([len(set(found[i]) & set(baseline[i])) / k for i in range(num_queries)])
+        results[index_type] = {
+            "built_as": type(index).__name__,
+            "build_seconds": round(build_seconds, 3),
+            "bytes": len(faiss.serialize_index(index)),
+            "latency_ms": round(latency_ms, 4),
+            f"recall@{k}": round(float(recall), 4),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.vectors, args.queries, args.k)
+    print(f"{'type':<7} {'built as':<22} {'MB':>8} {'build s':>8} {'query ms':>9} {'recall@' + str(args.k):>9}")
+    for index_type, r in results.items():
+        print(
+            f"{index_type:<7} {r['built_as']:<22} {r['bytes'] / 1e6:>8.2f} {r['build_seconds']:>8.2f} "
+            f"{r['latency_ms']:>9.3f} {r[f'recall@{args.k}']:>9.3f}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"vectors": args.vectors, "queries": args.queries, "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: BM25 query latency added by the hybrid retriever. Builds the
+lexical index over synthetic technical chunks (each carrying a unique part
+number) and reports per-query latency, exact-identifier hit rate and the
+size of the frozen postings.
+
+    python -m benchmarks.bench_lexical_index --chunks 50000 --queries 500
+"""
+from langchain_core.documents import Document
+import argparse
+import random
+import json
+import time
+
+from benchmarks.synthetic_pdf import WORDS
+from rag_pipeline.lexical_index import LexicalIndex
+
+
+def synthetic_chunks(count: int, rng: random.Random) -> list:
+    """~1000-character chunks of technical prose, each with one part number."""
+    return [
+        Document(page_content=f"Part P-{i:06d} " + " ".join(rng.choice(WORDS) for _ in range(150)))
+        for i in range(count)
+    ]
+
+
+def run(num_chunks: int, num_queries: int, k: int) -> dict:
+    rng = random.Random(0)
+    chunks = synthetic_chunks(num_chunks, rng)
+
+    start = time.perf_counter()
+    lexical_index = LexicalIndex()
+    lexical_index.add(chunks, 0)
+    lexical_index.freeze()
+    build_seconds = time.perf_counter() - start
+
+    targets = [rng.randrange(num_chunks) for _ in range(num_queries)]
+    queries = [f"what is the torque for part P-{target:06d} during inspection" for target in targets]
+    hits = 0
+    start = time.perf_counter()
+    for query, target in zip(queries, targets):
+        _, found = lexical_index.search(query, k)
+        hits += int(len(found) > 0 and found[0] == target)
+    latency_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    return {
+        "build_seconds": round(build_seconds, 3),
+        "vocabulary": len(lexical_index.vocab),
+        "bytes": lexical_index.nbytes(),
+        "latency_ms": round(latency_ms, 4),
+        "identifier_top1": round(hits / num_queries, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.chunks, args.queries, args.k)
+    print(f"chunks:            {args.chunks}")
+    print(f"build:             {results['build_seconds']:.2f} s")
+    print(f"vocabulary:        {results['vocabulary']} terms, {results['bytes'] / 1e6:.2f} MB postings")
+    print(f"BM25 query:        {results['latency_ms']:.3f} ms")
+    print(f"identifier top-1:  {results['identifier_top1']:.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"chunks": args.chunks, "queries": args.queries, "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: the old temp-file + PyPDFLoader loader against the in-memory,
+page-parallel PyMuPDF loader in utils/document_loader.py.
+
+    python -m benchmarks.bench_pdf_extract --pages 1000 --workers 4
+"""
+from langchain_community.document_loaders import PyPDFLoader
+from io import BytesIO
+import argparse
+import time
+import os
+
+from benchmarks.synthetic_pdf import make_pdf
+import utils.document_loader as document_loader
+
+
+def legacy_load_and_split(content: bytes, filename: str):
+    """The loader as it was before the in-memory path."""
+    os.makedirs("temp_data", exist_ok=True)
+    temp_path = os.path.join("temp_data", filename)
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    documents = PyPDFLoader(temp_path).load()
+    chunks = document_loader.get_splitter().split_documents(documents)
+    os.remove(temp_path)
+    return chunks
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=document_loader.PDF_EXTRACT_WORKERS)
+    args = parser.parse_args()
+
+    content = make_pdf(args.pages)
+    print(f"Synthetic PDF: {args.pages} pages, {len(content) / 1e6:.1f} MB")
+
+    seconds, chunks = timed(legacy_load_and_split, content, "bench.pdf")
+    print(f"  legacy PyPDFLoader:       {seconds:.2f}s  ({args.pages / seconds:.0f} pages/s, {len(chunks)} chunks)")
+
+    document_loader.PDF_EXTRACT_WORKERS = 1
+    seconds, chunks = timed(document_loader.load_and_split_pdf, BytesIO(content), "bench.pdf")
+    print(f"  in-memory, 1 worker:      {seconds:.2f}s  ({args.pages / seconds:.0f} pages/s, {len(chunks)} chunks)")
+
+    if args.workers > 1:
+        document_loader.PDF_EXTRACT_WORKERS = args.workers
+        document_loader.PDF_PARALLEL_MIN_PAGES = 0
+        # Start the worker processes outside the timed run
+        document_loader.load_and_split_pdf(make_pdf(args.workers), "warmup.pdf")
+        seconds, chunks = timed(document_loader.load_and_split_pdf, BytesIO(content), "bench.pdf")
+        print(f"  in-memory, {args.workers} workers:     {seconds:.2f}s  ({args.pages / seconds:.0f} pages/s, {len(chunks)} chunks)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark: per-request overhead of the old /chat wiring (declare a
+retriever class, call as_retriever and create_retrieval_chain on every call)
+versus the prebuilt QueryPipeline. Runs offline with fake embeddings and a
+fake chat model, so only the wiring and retrieval cost is measured.
+
+    python -m benchmarks.bench_query_pipeline --requests 500 --chunks 2000
+"""
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain.prompts import ChatPromptTemplate
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.documents import Document
+from typing import List
+import numpy as np
+import argparse
+import asyncio
+import time
+
+from rag_pipeline.vectorstore import DocumentIndex
+from rag_pipeline.query_pipeline import QueryPipeline
+
+DIM = 384
+
+
+def build_document_index(num_chunks: int, embedding) -> DocumentIndex:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((num_chunks, DIM)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = [f"chunk {i} " + "lorem ipsum " * 80 for i in range(num_chunks)]
+    metadatas = [{"page": i // 4} for i in range(num_chunks)]
+    store = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), embedding, metadatas=metadatas)
+    return DocumentIndex(store)
+
+
+def build_document_chain():
+    llm = FakeListChatModel(responses=["The answer."])
+    prompt = ChatPromptTemplate.from_template("Context:\n{context}\n\nQuestion: {input}\n\nAnswer:")
+    return create_stuff_documents_chain(llm, prompt)
+
+
+async def legacy_request(document_index: DocumentIndex, document_chain, question: str, start: int, end: int):
+    """The pre-QueryPipeline /chat wiring, rebuilt on every request."""
+    retriever = document_index.vector_store.as_retriever(search_kwargs={"k": 7})
+
+    class PageFilteredRetriever(BaseRetriever):
+        base_retriever: BaseRetriever
+        start_page: int
+        end_page: int
+
+        def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+            docs = self.base_retriever.invoke(query)
+            return [doc for doc in docs if self.start_page <= doc.metadata.get("page", -1) <= self.end_page]
+
+    filtered = PageFilteredRetriever(base_retriever=retriever, start_page=start, end_page=end)
+    chain = create_retrieval_chain(filtered, document_chain)
+    return await chain.ainvoke({"input": question})
+
+
+async def run(requests: int, chunks: int) -> dict:
+    embedding = DeterministicFakeEmbedding(size=DIM)
+    document_index = build_document_index(chunks, embedding)
+    document_chain = build_document_chain()
+    pipeline = QueryPipeline(document_index, document_chain)
+    last_page = chunks // 4 - 1
+
+    results = {}
+    for name in ("legacy", "pipeline"):
+        timings = []
+        for i in range(requests):
+            question = f"question {i}"
+            query_vector = embedding.embed_query(question)
+            start = time.perf_counter()
+            if name == "legacy":
+                await legacy_request(document_index, document_chain, question, 0, last_page)
+            else:
+                await pipeline.ainvoke(question, 0, last_page, query_vector)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "p50_ms": round(timings[len(timings) // 2], 3),
+            "p95_ms": round(timings[int(len(timings) * 0.95)], 3),
+        }
+    results["overhead_removed_ms"] = round(results["legacy"]["mean_ms"] - results["pipeline"]["mean_ms"], 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--chunks", type=int, default=2000)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.requests, args.chunks))
+    for name in ("legacy", "pipeline"):
+        r = results[name]
+        print(f"{name:>9}: mean {r['mean_ms']:.3f} ms  p50 {r['p50_ms']:.3f} ms  p95 {r['p95_ms']:.3f} ms")
+    print(f"Per-request overhead removed: {results['overhead_removed_ms']:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
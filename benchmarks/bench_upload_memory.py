@@ -0,0 +1,144 @@
+"""
+Benchmark: peak memory of one upload, from the request body to the parser.
+Uploads a synthetic PDF (padded with an incompressible attachment to reach
+--size-mb) to the app in-process, streaming it from disk, and reports the
+peak Python heap (tracemalloc) and, on Linux, the peak RSS growth while
+the body is received, hashed and spooled (until the 202), and over the whole
+ingest. Receiving should peak far below the file size: the body is parsed
+as it arrives and written to the spool file, never held whole.
+
+    python -m benchmarks.bench_upload_memory --size-mb 100 --json upload_memory.json
+"""
+import argparse
+import asyncio
+import tempfile
+import tracemalloc
+import json
+import time
+import os
+
+from benchmarks.bench_app import HashEmbeddingModel, configure_environment
+from benchmarks.synthetic_pdf import make_pdf
+
+MB = 1024 * 1024
+
+
+def write_padded_pdf(path: str, pages: int, size_mb: float):
+    import fitz  # PyMuPDF
+
+    pdf_doc = fitz.open(stream=make_pdf(pages), filetype="pdf")
+    padding = max(0, int(size_mb * MB) - len(pdf_doc.tobytes()))
+    if padding:
+        pdf_doc.embfile_add("padding.bin", os.urandom(padding))
+    pdf_doc.save(path)
+    pdf_doc.close()
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+class PeakMemory:
+    """Peak Python heap and RSS growth within a block."""
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.heap_start = tracemalloc.get_traced_memory()[0]
+        self.rss = reset_peak_rss()
+        self.rss_start = rss_kb("VmRSS") if self.rss else None
+        return self
+
+    def __exit__(self, *exc):
+        self.heap_peak_bytes = tracemalloc.get_traced_memory()[1] - self.heap_start
+        self.rss_peak_bytes = (rss_kb("VmHWM") - self.rss_start) * 1024 if self.rss else None
+
+    def to_dict(self, file_bytes: int) -> dict:
+        return {
+            "heap_peak_mb": round(self.heap_peak_bytes / MB, 2),
+            "heap_peak_vs_file": round(self.heap_peak_bytes / file_bytes, 3),
+            "rss_peak_mb": round(self.rss_peak_bytes / MB, 2) if self.rss_peak_bytes is not None else None,
+            "rss_peak_vs_file": round(self.rss_peak_bytes / file_bytes, 3) if self.rss_peak_bytes is not None else None,
+        }
+
+
+async def run(args, pdf_path: str) -> dict:
+    import httpx
+    import main as app_module
+    from rag_pipeline.embeddings import get_embeddings
+
+    get_embeddings()._model = HashEmbeddingModel()
+    app = app_module.app
+    file_bytes = os.path.getsize(pdf_path)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # A small untimed upload loads PyMuPDF and the splitter first
+            warm = await client.post("/upload", files={"file": ("warmup.pdf", make_pdf(2), "application/pdf")})
+            warm.raise_for_status()
+            tracemalloc.start()
+            try:
+                with PeakMemory() as ingest:
+                    with PeakMemory() as receive:
+                        start = time.perf_counter()
+                        with open(pdf_path, "rb") as f:
+                            response = await client.post("/upload", files={"file": ("bench.pdf", f, "application/pdf")})
+                        receive_seconds = time.perf_counter() - start
+                    response.raise_for_status()
+                    while True:
+                        job = (await client.get(response.json()["status_url"])).json()
+                        if job["status"] in ("ready", "failed"):
+                            break
+                        await asyncio.sleep(0.05)
+            finally:
+                tracemalloc.stop()
+    if job["status"] == "failed":
+        raise RuntimeError(f"Ingest failed: {job['error']}")
+    return {
+        "file_mb": round(file_bytes / MB, 2),
+        "pages": job["pages_total"],
+        "receive_seconds": round(receive_seconds, 3),
+        "receive": receive.to_dict(file_bytes),
+        "ingest": ingest.to_dict(file_bytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=100, help="PDF size, reached with an attachment")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        configure_environment(workdir, 0)
+        os.environ.setdefault("UPLOAD_MAX_BYTES", str(int(args.size_mb * MB) + MB))
+        pdf_path = os.path.join(workdir, "bench.pdf")
+        write_padded_pdf(pdf_path, args.pages, args.size_mb)
+        results = asyncio.run(run(args, pdf_path))
+
+    print(f"Upload of {results['file_mb']:.1f} MB ({results['pages']} pages), received in {results['receive_seconds']:.2f}s")
+    for phase in ("receive", "ingest"):
+        peak = results[phase]
+        rss = f"{peak['rss_peak_mb']:.1f} MB RSS ({peak['rss_peak_vs_file']:.2f}x)" if peak["rss_peak_mb"] is not None else "RSS n/a"
+        print(f"  {phase:<8} peak: {peak['heap_peak_mb']:.1f} MB heap ({peak['heap_peak_vs_file']:.2f}x file), {rss}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": {key: value for key, value in vars(args).items() if key != "json"}, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Synthetic text PDFs for the offline benchmarks (generated with PyMuPDF)."""
+import fitz  # PyMuPDF
+import random
+
+WORDS = (
+    "torque valve assembly clause warranty pressure sensor calibration manual "
+    "section error code replacement interval inspection contract party notice "
+    "liability firmware voltage bracket gasket schedule procedure"
+).split()
+
+
+def make_pdf(pages: int, words_per_page: int = 350, seed: int = 0) -> bytes:
+    """A text-only PDF with `pages` pages of pseudo-random technical prose."""
+    rng = random.Random(seed)
+    pdf_doc = fitz.open()
+    for page_number in range(pages):
+        page = pdf_doc.new_page()
+        words = [rng.choice(WORDS) for _ in range(words_per_page)]
+        words.insert(0, f"Page {page_number + 1} part P-{rng.randint(1000, 9999)}.")
+        page.insert_textbox(fitz.Rect(36, 36, 560, 806), " ".join(words), fontsize=9)
+    content = pdf_doc.tobytes()
+    pdf_doc.close()
+    return content
@@ -1,36 +1,165 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
-import io
-
-from utils.document_loader import load_and_split_pdf
-from rag_pipeline.vectorstore import create_vector_store
-from rag_pipeline.rag_chain import create_rag_chain
-from langchain.chains import create_retrieval_chain
-from langchain_core.retrievers import BaseRetriever
+from starlette.routing import Match
 from langchain_core.documents import Document
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+import numpy as np
+import json
+import time
+
+from rag_pipeline.rag_chain import LLM_PROVIDER, get_document_chain, peek_document_chain
+from rag_pipeline.llm_gateway import LLMUnavailable
+from rag_pipeline.query_pipeline import get_query_pipeline, pipeline_stats
+from rag_pipeline.reranker import get_reranker
+from rag_pipeline.context_packer import CONTEXT_PACKING, count_tokens, pack_context
+from rag_pipeline.embeddings import get_embeddings
+from rag_pipeline.query_batcher import embed_question, get_query_batcher
+from rag_pipeline.ingest import IngestManager, IngestQueueFull
+from rag_pipeline.index_store import IndexStore
+from rag_pipeline.vectorstore import DocumentIndex
+from rag_pipeline.store_cache import VectorStoreCache
+from rag_pipeline.answer_cache import SemanticAnswerCache
+from rag_pipeline.metrics import (
+    CHAT_STAGE_SECONDS, HTTP_REQUEST_SECONDS, REGISTRY, Gauge, Trace, observe_stages,
+    slow_traces, start_trace,
+)
+from rag_pipeline.warmup import WARMUP_ON_STARTUP, Warmup
+from utils.document_loader import get_splitter
+from utils.upload_spool import (
+    MULTIPART_OVERHEAD_BYTES, UPLOAD_MAX_BYTES, UploadTooLarge, size_limit_message, spool_multipart, spool_stream,
+)
+from rag_pipeline.document_collections import (
+    COLLECTION_MAX_DOCUMENTS, COLLECTION_ROUTE_CENTROIDS, CollectionStore, route_documents, search_collection,
+)
 
 # --- App Initialization ---
 app = FastAPI(title="RAG PDF Chatbot API")
 
-# --- In-Memory Storage ---
-vector_stores = {}
-document_chain = create_rag_chain()
+# --- Storage ---
+# Indexes persist on disk keyed by content hash; a bounded cache keeps the hot ones in memory.
+index_store = IndexStore()
+vector_stores = VectorStoreCache(
+    loader=lambda content_hash: index_store.load(content_hash) if index_store.has(content_hash) else None,
+)
+document_hashes: Dict[str, str] = {}  # filename -> content hash
+answer_cache = SemanticAnswerCache()
+collections = CollectionStore(index_store.root)
+ingest_manager = IngestManager(index_store)
+
+# --- Metrics ---
+REGISTRY.register(Gauge("rag_resident_documents", "Document indexes held in memory.", lambda: vector_stores.stats()["entries"]))
+REGISTRY.register(Gauge(
+    "rag_resident_index_bytes", "Estimated bytes of the in-memory document indexes.",
+    lambda: vector_stores.stats()["resident_bytes"],
+))
+REGISTRY.register(Gauge("rag_ingest_jobs_pending", "Uploads queued or being indexed.", lambda: ingest_manager.pending_count()))
+REGISTRY.register(Gauge("rag_answer_cache_entries", "Answers in the semantic answer cache.", lambda: answer_cache.stats()["entries"]))
+REGISTRY.register(Gauge(
+    "rag_llm_in_flight", "LLM calls in progress.",
+    # A metrics scrape must not build the LLM client
+    lambda: getattr(peek_document_chain(), "in_flight", 0),
+))
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def route_template(request: Request) -> str:
+    """The matched route's path (e.g. /upload/status/{job_id}), to keep label cardinality low."""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """Refuse an oversized upload from its Content-Length, before its body is read."""
+    if request.url.path == "/upload":
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES:
+            return JSONResponse(status_code=413, content={"detail": size_limit_message()})
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_time(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start, method=request.method, route=route_template(request), status=response.status_code
+    )
+    return response
+
+# --- Warm-up ---
+# Slow components load on a background thread so the server answers / right away; /ready reports progress.
+def warm_pdf_parser():
+    import fitz  # PyMuPDF, imported lazily by utils.pdf_utils
+    get_splitter()
+
+warmup = Warmup()
+warmup.add("llm", get_document_chain)
+warmup.add("embeddings", lambda: get_embeddings().embed_query("warm up"))
+warmup.add("pdf_parser", warm_pdf_parser)
+warmup.add("tokenizer", lambda: count_tokens("warm up"), required=CONTEXT_PACKING)
+if get_reranker():
+    warmup.add("reranker", lambda: get_reranker().load(), required=False)  # a failed load only disables re-ranking
 
-# --- Startup Event: Preload LLM (optional) ---
 @app.on_event("startup")
-async def preload_model():
-    print("🔄 Preloading Gemini model via create_rag_chain...")
-    _ = create_rag_chain()
-    print("✅ Gemini model is ready.")
+async def start_warmup():
+    if WARMUP_ON_STARTUP:
+        print(f"🔄 Warming up in the background (LLM provider: {LLM_PROVIDER})...")
+        warmup.start()
+
+@app.on_event("shutdown")
+async def stop_query_batcher():
+    batcher = get_query_batcher()
+    if batcher is not None:
+        await batcher.aclose()
 
 # --- Health Check Endpoint ---
 @app.get("/")
 def read_root():
     return {"status": "RAG chatbot is up and running!"}
 
+@app.get("/ready")
+def readiness():
+    """200 once the LLM client and models are loaded, else 503; lists each component's state."""
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/stats/embeddings")
+def embedding_stats():
+    batcher = get_query_batcher()
+    return {**get_embeddings().stats(), "query_batching": batcher.stats() if batcher else {"enabled": False}}
+
+@app.get("/stats/cache")
+def cache_stats():
+    return vector_stores.stats()
+
+@app.get("/stats/answers")
+def answer_cache_stats():
+    return answer_cache.stats()
+
+@app.get("/stats/llm")
+def llm_stats():
+    return get_document_chain().stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of the stage histograms and resource gauges."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/slow")
+def recent_slow_traces():
+    return list(slow_traces)
+
+@app.get("/stats/pipeline")
+def pipeline_timing_stats():
+    reranker = get_reranker()
+    return {**pipeline_stats.stats(), "reranker": reranker.stats() if reranker else {"enabled": False}}
+
 # --- Pydantic Models ---
 class ChatRequest(BaseModel):
     question: str
@@ -41,83 +170,409 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     sources: List[int]
+    cached: bool = False
+    timings: Dict[str, Any] = {}
+
+class CollectionRequest(BaseModel):
+    filenames: List[str]
+
+class CollectionChatRequest(BaseModel):
+    question: str
+    filenames: Optional[List[str]] = None  # restrict to these documents of the collection
+    start_page: Optional[int] = None  # applied to every document
+    end_page: Optional[int] = None
+
+class DocumentSource(BaseModel):
+    filename: str
+    page: int
+
+class CollectionChatResponse(BaseModel):
+    answer: str
+    sources: List[DocumentSource]
 
 # --- API Endpoints ---
 
-@app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    if not file.filename.endswith(".pdf"):
+@app.post("/upload", status_code=202)
+async def upload_pdf(request: Request, filename: Optional[str] = None):
+    """
+    Takes a multipart form with a `file` part, or the raw PDF as the body
+    (`Content-Type: application/pdf`) with `?filename=`. Either way the body
+    is parsed as it arrives and the PDF is spooled to one temp file, so the
+    size limit applies while receiving and the upload is never held whole.
+    """
+    content_type = request.headers.get("content-type", "")
+    multipart = content_type.startswith("multipart/form-data")
+    if not multipart and not (filename or "").endswith(".pdf"):
         return JSONResponse(status_code=400, content={"error": "Only PDF files allowed"})
-    
-    content = await file.read()
-    documents = load_and_split_pdf(io.BytesIO(content), file.filename)
-    if not documents:
-        raise HTTPException(status_code=400, detail="Could not extract text from the PDF.")
-        
-    vector_stores[file.filename] = create_vector_store(documents)
-    print(f"✅ Uploaded and processed PDF: {file.filename}")
-    return {"message": f"PDF '{file.filename}' processed successfully."}
+
+    start = time.perf_counter()
+    try:
+        if multipart:
+            upload, filename = await spool_multipart(request.stream(), content_type)
+        else:
+            upload = await spool_stream(request.stream())
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not (filename or "").endswith(".pdf"):
+        upload.close()
+        return JSONResponse(status_code=400, content={"error": "Only PDF files allowed"})
+    read_ms = elapsed_ms(start)
+    try:
+        job = ingest_manager.submit(
+            upload, filename, on_update=_store_document_index, timings={"read_ms": read_ms},
+            on_discard=_discard_document_index,
+        )
+    except IngestQueueFull as e:
+        upload.close()
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception:
+        upload.close()
+        raise HTTPException(status_code=400, detail="Could not open the PDF.")
+
+    previous_hash = job.previous_content_hash
+    if previous_hash and previous_hash != job.content_hash:
+        # The filename now refers to different content; its cached answers are stale
+        answer_cache.invalidate(previous_hash)
+
+    if job.reused:
+        message = f"PDF '{filename}' was already processed; reusing its stored index."
+    else:
+        message = f"PDF '{filename}' queued for processing."
+        print(f"📥 Queued PDF for processing: {filename} (job {job.job_id})")
+    return {
+        "message": message,
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/upload/status/{job.job_id}",
+        "pages": job.pages_total,
+    }
+
+@app.get("/upload/status/{job_id}")
+def upload_status(job_id: str):
+    job = ingest_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found.")
+    return job.to_dict()
+
+def _store_document_index(filename: str, document_index: DocumentIndex):
+    # Called with the growing index after every batch, then with the finished one
+    content_hash = document_index.content_hash
+    if vector_stores.peek(content_hash) is document_index:
+        vector_stores.resize(content_hash)
+    else:
+        vector_stores.put(content_hash, document_index)
+    document_hashes[filename] = content_hash
+
+def _discard_document_index(filename: str, document_index: DocumentIndex):
+    # The upload failed: forget its partial index so /chat no longer answers from it
+    vector_stores.pop(document_index.content_hash, document_index)
+    if document_hashes.get(filename) == document_index.content_hash:
+        del document_hashes[filename]
+
+def get_document_index(filename: str) -> Optional[DocumentIndex]:
+    """Resolve a filename to its index, loading it from disk on first use."""
+    content_hash = index_store.lookup(filename) or document_hashes.get(filename)
+    if content_hash is None:
+        return None
+    document_hashes[filename] = content_hash
+    return vector_stores.get(content_hash)
+
+def get_routing_table(filenames: List[str]) -> Dict[str, Optional[np.ndarray]]:
+    """
+    Routing centroids per indexed filename. Stored documents are read from the
+    small centroid file saved next to their index, so no index is opened;
+    documents still being ingested use their in-memory index. Filenames
+    pointing at the same content as an earlier one are left out, so each
+    index is searched once.
+    """
+    table = {}
+    seen = set()
+    for filename in filenames:
+        content_hash = index_store.lookup(filename) or document_hashes.get(filename)
+        if content_hash is None or content_hash in seen:
+            continue
+        seen.add(content_hash)
+        if index_store.has(content_hash):
+            centroids = index_store.routing_centroids(content_hash)
+            if centroids is None:
+                # Stored before centroids were saved: compute them once from the index
+                document_index = get_document_index(filename)
+                centroids = document_index.routing_centroids(COLLECTION_ROUTE_CENTROIDS) if document_index else None
+                if centroids is not None:
+                    index_store.save_routing_centroids(content_hash, centroids)
+            table[filename] = centroids
+            continue
+        document_index = vector_stores.peek(content_hash)
+        if document_index is not None:
+            table[filename] = document_index.routing_centroids(COLLECTION_ROUTE_CENTROIDS)
+    return table
+
+# --- Chat Helpers ---
+GREETINGS = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening']
+GREETING_REPLY = "Hello! I'm ready to answer questions about your document. What would you like to know?"
+NOT_FOUND_PHRASES = [
+    "not found", 
+    "cannot answer", 
+    "do not contain the answer", 
+    "not in the provided context",
+    "i cannot answer"
+]
+NOT_FOUND_REPLY = "I can only answer questions based on the content of the document you provided. Please ask something related to the PDF."
+# Streamed answers are held back until this many characters arrive, so a
+# "not found" reply can be swapped out before the client ever sees it.
+STREAM_HOLD_CHARS = 120
+
+def is_greeting(question: str) -> bool:
+    return question.lower().strip().rstrip("!?.") in GREETINGS
+
+def is_not_found(answer: str) -> bool:
+    return any(phrase in answer.lower() for phrase in NOT_FOUND_PHRASES)
+
+def source_pages(context_docs: List) -> List[int]:
+    return sorted(list(set(doc.metadata.get("page", -1) + 1 for doc in context_docs)))
+
+async def resolve_document(filename: str) -> DocumentIndex:
+    """Find the document's index or raise the matching HTTP error."""
+    document_index = await run_in_threadpool(get_document_index, filename)
+    if document_index is None:
+        job = ingest_manager.active_job_for(filename)
+        if job is not None:
+            raise HTTPException(status_code=409, detail=f"PDF '{filename}' is still being processed ({job.status}).")
+        raise HTTPException(status_code=404, detail=f"PDF '{filename}' not found. Please upload it first.")
+    return document_index
+
+def pipeline_for(document_index: DocumentIndex):
+    return get_query_pipeline(document_index, get_document_chain())
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def finish_chat(timings: dict, start: float, trace: Optional[Trace]) -> dict:
+    """Record the question's stage timings in /metrics and in its trace, if traced."""
+    timings["total_ms"] = elapsed_ms(start)
+    observe_stages(CHAT_STAGE_SECONDS, timings)
+    if trace is not None:
+        trace.finish(timings)
+    return timings
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    if request.filename not in vector_stores:
-        raise HTTPException(status_code=404, detail=f"PDF '{request.filename}' not found. Please upload it first.")
+async def chat(request: ChatRequest, response: Response, x_trace_id: Optional[str] = Header(None)):
+    start = time.perf_counter()
+    trace = start_trace("POST /chat", x_trace_id)
+    if trace is not None:
+        response.headers["X-Trace-Id"] = trace.trace_id
+    timings: dict = {}
 
-    normalized_question = request.question.lower().strip().rstrip("!?.")
-    greetings = ['hi', 'hello', 'hey', 'greetings', 'good morning', 'good afternoon', 'good evening']
-    if normalized_question in greetings:
-        return ChatResponse(
-            answer="Hello! I'm ready to answer questions about your document. What would you like to know?",
-            sources=[]
-        )
+    stage = time.perf_counter()
+    document_index = await resolve_document(request.filename)
+    timings["resolve_ms"] = elapsed_ms(stage)
 
-    vector_store = vector_stores[request.filename]
-    retriever = vector_store.as_retriever(search_kwargs={"k": 7})
-
-    class PageFilteredRetriever(BaseRetriever):
-        base_retriever: BaseRetriever
-        start_page: int
-        end_page: int
-
-        async def _aget_relevant_documents(self, query: str) -> List[Document]:
-            docs = await self.base_retriever.aget_relevant_documents(query)
-            return [
-                doc for doc in docs 
-                if self.start_page <= doc.metadata.get('page', -1) <= self.end_page
-            ]
-
-        def _get_relevant_documents(self, query: str) -> List[Document]:
-            docs = self.base_retriever.get_relevant_documents(query)
-            return [
-                doc for doc in docs 
-                if self.start_page <= doc.metadata.get('page', -1) <= self.end_page
-            ]
-
-    filtered_retriever = PageFilteredRetriever(
-        base_retriever=retriever,
-        start_page=request.start_page,
-        end_page=request.end_page
-    )
+    stage = time.perf_counter()
+    greeting = is_greeting(request.question)
+    timings["greeting_ms"] = elapsed_ms(stage)
+    if greeting:
+        return ChatResponse(answer=GREETING_REPLY, sources=[], timings=finish_chat(timings, start, trace))
 
-    full_chain = create_retrieval_chain(filtered_retriever, document_chain)
-    response = await full_chain.ainvoke({"input": request.question})
-    
-    answer = response.get("answer", "An error occurred during processing.")
-    context_docs = response.get("context", [])
-
-    not_found_phrases = [
-        "not found", 
-        "cannot answer", 
-        "do not contain the answer", 
-        "not in the provided context",
-        "i cannot answer"
-    ]
-    if any(phrase in answer.lower() for phrase in not_found_phrases):
+    # Embed once: the same vector serves the answer cache and the retriever
+    stage = time.perf_counter()
+    query_vector = await embed_question(request.question)
+    timings["query_embed_ms"] = elapsed_ms(stage)
+    stage = time.perf_counter()
+    cache_key = (document_index.content_hash, request.start_page, request.end_page)
+    hit = answer_cache.lookup(*cache_key, query_vector)
+    timings["cache_lookup_ms"] = elapsed_ms(stage)
+    if hit is not None:
         return ChatResponse(
-            answer="I can only answer questions based on the content of the document you provided. Please ask something related to the PDF.",
-            sources=[]
+            answer=hit.answer, sources=hit.sources, cached=True, timings=finish_chat(timings, start, trace)
         )
+
+    pipeline = pipeline_for(document_index)
+    try:
+        result = await pipeline.ainvoke(request.question, request.start_page, request.end_page, query_vector, timings)
+    except LLMUnavailable as e:
+        finish_chat(timings, start, trace)
+        raise HTTPException(status_code=503, detail=str(e))
     
-    sources = sorted(list(set(doc.metadata.get("page", -1) + 1 for doc in context_docs)))
+    answer = result.get("answer", "An error occurred during processing.")
+    context_docs = result.get("context", [])
+
+    if is_not_found(answer):
+        answer, sources = NOT_FOUND_REPLY, []
+    else:
+        sources = source_pages(context_docs)
+    if document_index.complete:
+        answer_cache.store(*cache_key, query_vector, answer, sources)
     
-    return ChatResponse(answer=answer, sources=sources)
+    return ChatResponse(answer=answer, sources=sources, timings=finish_chat(timings, start, trace))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_trace_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events version of /chat. Emits `sources` once retrieval is done,
+    then `token` events as Gemini generates, then `done` with the full answer.
+    A `replace` event swaps the streamed text for a fixed reply (e.g. not found).
+    """
+    start = time.perf_counter()
+    trace = start_trace("POST /chat/stream", x_trace_id)
+    timings: dict = {}
+    stage = time.perf_counter()
+    document_index = await resolve_document(request.filename)
+    timings["resolve_ms"] = elapsed_ms(stage)
+
+    async def events():
+        stage = time.perf_counter()
+        greeting = is_greeting(request.question)
+        timings["greeting_ms"] = elapsed_ms(stage)
+        if greeting:
+            yield sse_event("sources", {"sources": []})
+            yield sse_event("token", {"text": GREETING_REPLY})
+            finish_chat(timings, start, trace)
+            yield sse_event("done", {"answer": GREETING_REPLY, "sources": [], "cached": False, "timings": timings})
+            return
+
+        stage = time.perf_counter()
+        query_vector = await embed_question(request.question)
+        timings["query_embed_ms"] = elapsed_ms(stage)
+        stage = time.perf_counter()
+        cache_key = (document_index.content_hash, request.start_page, request.end_page)
+        hit = answer_cache.lookup(*cache_key, query_vector)
+        timings["cache_lookup_ms"] = elapsed_ms(stage)
+        if hit is not None:
+            yield sse_event("sources", {"sources": hit.sources})
+            yield sse_event("token", {"text": hit.answer})
+            finish_chat(timings, start, trace)
+            yield sse_event("done", {"answer": hit.answer, "sources": hit.sources, "cached": True, "timings": timings})
+            return
+
+        sources: List[int] = []
+        answer = ""
+        flushed = 0
+        try:
+            pipeline = pipeline_for(document_index)
+            chunks = pipeline.astream(request.question, request.start_page, request.end_page, query_vector, timings)
+            try:
+                async for chunk in chunks:
+                    if "context" in chunk:
+                        sources = source_pages(chunk["context"])
+                        yield sse_event("sources", {"sources": sources})
+                    if "answer" in chunk:
+                        answer += chunk["answer"]
+                        if len(answer) < STREAM_HOLD_CHARS:
+                            continue
+                        if flushed == 0 and is_not_found(answer):
+                            break
+                        yield sse_event("token", {"text": answer[flushed:]})
+                        flushed = len(answer)
+            finally:
+                # Stops generation right away after the not-found break or a client disconnect
+                await chunks.aclose()
+        except Exception as e:
+            finish_chat(timings, start, trace)
+            yield sse_event("error", {"detail": str(e)})
+            return
+
+        finish_chat(timings, start, trace)
+        if is_not_found(answer):
+            if document_index.complete:
+                answer_cache.store(*cache_key, query_vector, NOT_FOUND_REPLY, [])
+            yield sse_event("replace", {"answer": NOT_FOUND_REPLY, "sources": []})
+            yield sse_event("done", {"answer": NOT_FOUND_REPLY, "sources": [], "cached": False, "timings": timings})
+            return
+        if flushed < len(answer):
+            yield sse_event("token", {"text": answer[flushed:]})
+        if document_index.complete:
+            answer_cache.store(*cache_key, query_vector, answer, sources)
+        yield sse_event("done", {"answer": answer, "sources": sources, "cached": False, "timings": timings})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if trace is not None:
+        headers["X-Trace-Id"] = trace.trace_id
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+# --- Collections ---
+
+@app.put("/collections/{name}")
+def put_collection(name: str, request: CollectionRequest):
+    filenames = list(dict.fromkeys(request.filenames))
+    if not filenames:
+        raise HTTPException(status_code=400, detail="A collection needs at least one PDF.")
+    if len(filenames) > COLLECTION_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"A collection can hold at most {COLLECTION_MAX_DOCUMENTS} PDFs.")
+    unknown = [
+        filename for filename in filenames
+        if index_store.lookup(filename) is None
+        and filename not in document_hashes
+        and ingest_manager.active_job_for(filename) is None
+    ]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"PDFs not found: {', '.join(unknown)}. Please upload them first.")
+    collections.put(name, filenames)
+    return {"name": name, "filenames": filenames}
+
+@app.get("/collections/{name}")
+def get_collection(name: str):
+    filenames = collections.get(name)
+    if filenames is None:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found.")
+    return {"name": name, "filenames": filenames}
+
+@app.delete("/collections/{name}")
+def delete_collection(name: str):
+    if not collections.delete(name):
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found.")
+    return {"message": f"Collection '{name}' deleted."}
+
+def collection_sources(context_docs: List) -> List[DocumentSource]:
+    pages = sorted(set((doc.metadata.get("source", ""), doc.metadata.get("page", -1) + 1) for doc in context_docs))
+    return [DocumentSource(filename=filename, page=page) for filename, page in pages]
+
+@app.post("/collections/{name}/chat", response_model=CollectionChatResponse)
+async def chat_collection(name: str, request: CollectionChatRequest):
+    """
+    Answer one question from all PDFs of a collection. The question is routed
+    with the documents' stored centroids; only the documents it is routed to
+    are loaded and searched, in parallel, and their hits are merged into a
+    single top-k before Gemini is called once.
+    """
+    filenames = collections.get(name)
+    if filenames is None:
+        raise HTTPException(status_code=404, detail=f"Collection '{name}' not found.")
+    if request.filenames is not None:
+        wanted = set(request.filenames)
+        filenames = [filename for filename in filenames if filename in wanted]
+
+    routing_table = await run_in_threadpool(get_routing_table, filenames)
+    if not routing_table:
+        if any(ingest_manager.active_job_for(filename) for filename in filenames):
+            raise HTTPException(status_code=409, detail=f"The PDFs in '{name}' are still being processed.")
+        raise HTTPException(status_code=404, detail=f"No indexed PDFs in collection '{name}'.")
+
+    if is_greeting(request.question):
+        return CollectionChatResponse(answer=GREETING_REPLY, sources=[])
+
+    query_vector = await embed_question(request.question)
+    # Only the routed documents' indexes are opened
+    selected = route_documents(query_vector, routing_table)
+    loaded = await run_in_threadpool(lambda: {filename: get_document_index(filename) for filename in selected})
+    document_indexes = {filename: index for filename, index in loaded.items() if index is not None}
+    start_page = request.start_page if request.start_page is not None else 0
+    end_page = request.end_page if request.end_page is not None else 10 ** 9
+    hits = await run_in_threadpool(search_collection, query_vector, document_indexes, 7, start_page, end_page)
+    # Label chunks with the collection member they were found under, not the filename stored in a shared index
+    context_docs = [
+        Document(page_content=doc.page_content, metadata={**doc.metadata, "source": filename})
+        for filename, doc, _ in hits
+    ]
+    if CONTEXT_PACKING:
+        context_docs, tokens_before, tokens_after = pack_context(context_docs)
+        print(f"📦 Packed collection context: {len(hits)} chunks, {tokens_before} -> {tokens_after} tokens")
+    try:
+        answer = await get_document_chain().ainvoke({"input": request.question, "context": context_docs})
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if is_not_found(answer):
+        return CollectionChatResponse(answer=NOT_FOUND_REPLY, sources=[])
+    return CollectionChatResponse(answer=answer, sources=collection_sources(context_docs))
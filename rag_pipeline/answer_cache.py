@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import threading
+import time
+import os
+
+# --- Answer Cache Settings ---
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))  # seconds, 0 = never
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+BucketKey = Tuple[str, int, int]  # (content hash, start page, end page)
+
+
+class CachedAnswer:
+    __slots__ = ("bucket", "vector", "answer", "sources", "created_at")
+
+    def __init__(self, bucket: BucketKey, vector: np.ndarray, answer: str, sources: List[int]):
+        self.bucket = bucket
+        self.vector = vector
+        self.answer = answer
+        self.sources = sources
+        self.created_at = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """
+    Remembers answers per (document, page range) and serves them again for
+    questions whose embedding is within `threshold` cosine similarity of a
+    previously answered one. Entries expire after `ttl` and the least recently
+    used ones are dropped beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl: float = ANSWER_CACHE_TTL,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._buckets: Dict[BucketKey, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return self.ttl > 0 and time.monotonic() - entry.created_at > self.ttl
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        bucket = self._buckets.get(entry.bucket)
+        if bucket is not None:
+            bucket.remove(entry_id)
+            if not bucket:
+                del self._buckets[entry.bucket]
+
+    def lookup(
+        self, content_hash: str, start_page: int, end_page: int, query_vector: List[float]
+    ) -> Optional[CachedAnswer]:
+        """Best cached answer above the similarity threshold, if any."""
+        bucket_key = (content_hash, start_page, end_page)
+        query = self._normalize(query_vector)
+        with self._lock:
+            expired = [
+                entry_id for entry_id in self._buckets.get(bucket_key, [])
+                if self._expired(self._entries[entry_id])
+            ]
+            for entry_id in expired:
+                self._remove(entry_id)
+            entry_ids = self._buckets.get(bucket_key, [])
+            if entry_ids:
+                vectors = np.stack([self._entries[entry_id].vector for entry_id in entry_ids])
+                similarities = vectors @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.hits += 1
+                    self._entries.move_to_end(entry_ids[best])
+                    return self._entries[entry_ids[best]]
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        content_hash: str,
+        start_page: int,
+        end_page: int,
+        query_vector: List[float],
+        answer: str,
+        sources: List[int],
+    ):
+        bucket_key = (content_hash, start_page, end_page)
+        entry = CachedAnswer(bucket_key, self._normalize(query_vector), answer, sources)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(bucket_key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, content_hash: str):
+        """Drop every answer for a document, e.g. after it was re-uploaded."""
+        with self._lock:
+            for bucket_key in [key for key in self._buckets if key[0] == content_hash]:
+                for entry_id in list(self._buckets[bucket_key]):
+                    self._remove(entry_id)
+                    self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
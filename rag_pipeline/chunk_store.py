@@ -0,0 +1,100 @@
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+from collections.abc import Mapping
+from typing import Iterator, List, Union
+import numpy as np
+import mmap
+import json
+import os
+
+# Files of a stored document's chunk text, next to its index.faiss
+CHUNK_TEXT_FILE = "chunks.bin"
+CHUNK_METADATA_FILE = "chunk_metadata.bin"
+CHUNK_ARRAYS_FILE = "chunk_{}.npy"  # text_offsets, metadata_offsets, pages
+
+# Per-chunk bytes a worker holds privately for a mapped store (page map entry and ids)
+MAPPED_CHUNK_BYTES = 100
+
+
+def write_chunk_store(directory: str, documents: List[Document]):
+    """
+    Write chunks (in vector id order) as two concatenated UTF-8 blobs, text
+    and JSON metadata, plus offset and page arrays, for `ChunkStore` to map.
+    """
+    texts = [doc.page_content.encode("utf-8") for doc in documents]
+    metadatas = [json.dumps(doc.metadata, separators=(",", ":")).encode("utf-8") for doc in documents]
+    for file_name, blobs in ((CHUNK_TEXT_FILE, texts), (CHUNK_METADATA_FILE, metadatas)):
+        with open(os.path.join(directory, file_name), "wb") as f:
+            for blob in blobs:
+                f.write(blob)
+    arrays = {
+        "text_offsets": np.cumsum([0] + [len(blob) for blob in texts], dtype=np.int64),
+        "metadata_offsets": np.cumsum([0] + [len(blob) for blob in metadatas], dtype=np.int64),
+        "pages": np.array([doc.metadata.get("page", -1) for doc in documents], dtype=np.int32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, CHUNK_ARRAYS_FILE.format(name)), array)
+
+
+def has_chunk_store(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, CHUNK_TEXT_FILE))
+
+
+def _map_file(path: str):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ChunkIds(Mapping):
+    """The identity vector id -> chunk id map of a stored document, without a dict per worker."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, vector_id: int) -> int:
+        if not 0 <= vector_id < self.size:
+            raise KeyError(vector_id)
+        return int(vector_id)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class ChunkStore(Docstore):
+    """
+    Read-only docstore over memory-mapped chunk files. Every worker that
+    opens the same document shares its text through the OS page cache, and
+    a Document is only built for the chunks a query returns.
+    """
+
+    def __init__(self, directory: str):
+        self._text = _map_file(os.path.join(directory, CHUNK_TEXT_FILE))
+        self._metadata = _map_file(os.path.join(directory, CHUNK_METADATA_FILE))
+        load = lambda name: np.load(os.path.join(directory, CHUNK_ARRAYS_FILE.format(name)), mmap_mode="r")
+        self._text_offsets = load("text_offsets")
+        self._metadata_offsets = load("metadata_offsets")
+        self.pages = load("pages")
+        self.ids = ChunkIds(len(self.pages))
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        chunk_id = int(search)
+        if not 0 <= chunk_id < len(self):
+            return f"ID {search} not found."
+        text = self._text[self._text_offsets[chunk_id]:self._text_offsets[chunk_id + 1]].decode("utf-8")
+        metadata = self._metadata[self._metadata_offsets[chunk_id]:self._metadata_offsets[chunk_id + 1]]
+        return Document(page_content=text, metadata=json.loads(metadata))
+
+    def delete(self, ids: List) -> None:
+        raise NotImplementedError("Stored chunks are read-only.")
+
+    def nbytes(self) -> int:
+        """Private memory per worker; the mapped text itself is shared page cache."""
+        return len(self) * MAPPED_CHUNK_BYTES
@@ -0,0 +1,153 @@
+from langchain_core.documents import Document
+from typing import Dict, List, Optional, Tuple
+import threading
+import os
+
+# --- Context Packing Settings ---
+CONTEXT_PACKING = os.getenv("CONTEXT_PACKING", "true").lower() == "true"
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "2000"))
+CONTEXT_TOKENIZER_PATH = os.getenv("CONTEXT_TOKENIZER_PATH", "models/all-MiniLM-L6-v2/tokenizer.json")
+# A truncated block shorter than this is dropped instead of sent
+CONTEXT_MIN_TAIL_TOKENS = 50
+
+# Overlaps looked for when chunks carry no start_index (the splitter overlap is 100)
+_MIN_OVERLAP_CHARS = 20
+_MAX_OVERLAP_CHARS = 200
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    """The local WordPiece tokenizer, or None to fall back to ~4 characters per token."""
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        with _tokenizer_lock:
+            if not _tokenizer_loaded:
+                try:
+                    from tokenizers import Tokenizer
+
+                    _tokenizer = Tokenizer.from_file(CONTEXT_TOKENIZER_PATH)
+                    _tokenizer.no_truncation()
+                except Exception as e:
+                    print(f"⚠️ Could not load tokenizer '{CONTEXT_TOKENIZER_PATH}', approximating token counts: {e}")
+                _tokenizer_loaded = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return len(text) // 4 + 1
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of `text` that is at most `max_tokens` tokens."""
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return text[:max_tokens * 4]
+    offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+    if len(offsets) <= max_tokens:
+        return text
+    return text[:offsets[max_tokens - 1][1]] if max_tokens > 0 else ""
+
+
+def _text_overlap(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    for size in range(min(len(left), len(right), _MAX_OVERLAP_CHARS), _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class _Block:
+    """Consecutive text from one page, built from one or more chunks."""
+
+    __slots__ = ("source", "page", "start", "end", "text", "rank")
+
+    def __init__(self, doc: Document, rank: int):
+        self.source = doc.metadata.get("source")
+        self.page = doc.metadata.get("page", -1)
+        self.start = doc.metadata.get("start_index")
+        self.text = doc.page_content
+        self.end = self.start + len(self.text) if self.start is not None else None
+        self.rank = rank
+
+    def absorb(self, doc: Document, rank: int) -> bool:
+        """Append a chunk that continues or overlaps this block; False if it does not."""
+        text = doc.page_content
+        start = doc.metadata.get("start_index")
+        if self.start is not None and start is not None:
+            if start > self.end:
+                return False
+            self.text += text[self.end - start:]
+            self.end = max(self.end, start + len(text))
+        elif text not in self.text:
+            # No offsets (indexed before start_index was stored): match the overlapping text
+            tail = _text_overlap(self.text, text)
+            head = _text_overlap(text, self.text)
+            if tail and tail >= head:
+                self.text += text[tail:]
+            elif head:
+                self.text = text + self.text[head:]
+            else:
+                return False
+        self.rank = min(self.rank, rank)
+        return True
+
+    def to_document(self, text: Optional[str] = None) -> Document:
+        metadata = {"source": self.source, "page": self.page}
+        if self.start is not None:
+            metadata["start_index"] = self.start
+        return Document(page_content=text if text is not None else self.text, metadata=metadata)
+
+
+def pack_context(documents: List[Document], max_tokens: int = CONTEXT_MAX_TOKENS) -> Tuple[List[Document], int, int]:
+    """
+    Merge overlapping or adjacent chunks from the same page into single
+    blocks, drop duplicate chunks, then keep the best-ranked blocks (by
+    their best chunk's retrieval rank) within `max_tokens`, truncating the
+    last one. Blocks are returned in page order.
+    Returns (blocks, tokens before packing, tokens after packing).
+    """
+    tokens_before = sum(count_tokens(doc.page_content) for doc in documents)
+
+    by_page: Dict[Tuple, List[Tuple[int, Document]]] = {}
+    for rank, doc in enumerate(documents):
+        key = (doc.metadata.get("source"), doc.metadata.get("page", -1))
+        by_page.setdefault(key, []).append((rank, doc))
+
+    blocks: List[_Block] = []
+    for chunks in by_page.values():
+        chunks.sort(key=lambda item: item[1].metadata.get("start_index", item[0]))
+        page_blocks: List[_Block] = []
+        for rank, doc in chunks:
+            # Sorted by offset, a chunk can only continue the last block; without offsets try them all
+            candidates = page_blocks[-1:] if "start_index" in doc.metadata else page_blocks
+            if not any(block.absorb(doc, rank) for block in candidates):
+                page_blocks.append(_Block(doc, rank))
+        blocks.extend(page_blocks)
+
+    packed: List[Tuple[_Block, str]] = []
+    remaining = max_tokens
+    for block in sorted(blocks, key=lambda block: block.rank):
+        tokens = count_tokens(block.text)
+        if tokens <= remaining:
+            packed.append((block, block.text))
+            remaining -= tokens
+        elif remaining >= CONTEXT_MIN_TAIL_TOKENS:
+            packed.append((block, truncate_to_tokens(block.text, remaining)))
+            remaining = 0
+        if remaining < CONTEXT_MIN_TAIL_TOKENS:
+            break
+    if not packed and blocks:
+        # Always send something, even if the best block alone exceeds the budget
+        best = min(blocks, key=lambda block: block.rank)
+        packed.append((best, truncate_to_tokens(best.text, max_tokens)))
+
+    packed.sort(key=lambda item: (str(item[0].source), item[0].page, item[0].start or 0))
+    result = [block.to_document(text) for block, text in packed]
+    tokens_after = sum(count_tokens(doc.page_content) for doc in result)
+    return result, tokens_before, tokens_after
@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import hashlib
+import heapq
+import json
+import uuid
+import os
+
+from rag_pipeline.vectorstore import DocumentIndex
+
+# --- Collection Settings ---
+COLLECTION_SEARCH_WORKERS = int(os.getenv("COLLECTION_SEARCH_WORKERS", "8"))
+# Only the documents whose routing centroids are closest to the question are searched
+COLLECTION_ROUTE_TOP = int(os.getenv("COLLECTION_ROUTE_TOP", "8"))
+COLLECTION_ROUTE_CENTROIDS = int(os.getenv("COLLECTION_ROUTE_CENTROIDS", "8"))  # per document
+COLLECTION_MAX_DOCUMENTS = int(os.getenv("COLLECTION_MAX_DOCUMENTS", "500"))
+
+_search_pool = ThreadPoolExecutor(max_workers=COLLECTION_SEARCH_WORKERS, thread_name_prefix="collection-search")
+
+
+class CollectionStore:
+    """Named sets of uploaded filenames, one small JSON file per collection."""
+
+    def __init__(self, root: str):
+        self.root = os.path.join(root, "collections")
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        name_key = hashlib.sha256(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{name_key}.json")
+
+    def get(self, name: str) -> Optional[List[str]]:
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)["filenames"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, name: str, filenames: List[str]):
+        path = self._path(name)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"name": name, "filenames": filenames}, f)
+        os.replace(tmp_path, path)
+
+    def delete(self, name: str) -> bool:
+        try:
+            os.remove(self._path(name))
+            return True
+        except OSError:
+            return False
+
+
+def route_documents(
+    query_vector: List[float], routing_table: Dict[str, Optional[np.ndarray]], top_n: int = COLLECTION_ROUTE_TOP
+) -> List[str]:
+    """
+    Pick the `top_n` documents most likely to hold the answer by the distance
+    from the question to each document's routing centroids (filename ->
+    centroids). Only the picked documents' indexes need to be opened, so the
+    work per question stays constant as the collection grows.
+    Documents without centroids (nothing to reconstruct) are always searched.
+    """
+    if len(routing_table) <= top_n:
+        return list(routing_table)
+    query = np.asarray(query_vector, dtype=np.float32)
+    scored = []
+    for filename, centroids in routing_table.items():
+        if centroids is None:
+            scored.append((float("-inf"), filename))
+        else:
+            scored.append((float(((centroids - query) ** 2).sum(axis=1).min()), filename))
+    return [filename for _, filename in heapq.nsmallest(top_n, scored)]
+
+
+def search_collection(
+    query_vector: List[float],
+    document_indexes: Dict[str, DocumentIndex],
+    k: int,
+    start_page: int = 0,
+    end_page: int = 10 ** 9,
+) -> List[Tuple[str, Document, float]]:
+    """
+    Fan the search out to the (routed) documents in parallel (FAISS releases
+    the GIL) and merge their hits into one global top-k by distance. Each hit
+    comes with the collection filename it was found under: an index shared by
+    identical uploads labels its chunks with the first upload's filename.
+    """
+    futures = {
+        filename: _search_pool.submit(
+            document_index.similarity_search_by_vector, query_vector, k, start_page, end_page
+        )
+        for filename, document_index in document_indexes.items()
+    }
+    hits = [(filename, doc, distance) for filename, future in futures.items() for doc, distance in future.result()]
+    return heapq.nsmallest(k, hits, key=lambda hit: hit[2])
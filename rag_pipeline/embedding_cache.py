@@ -0,0 +1,213 @@
+from typing import List, Optional
+import numpy as np
+import threading
+import hashlib
+import sqlite3
+import fcntl
+import json
+import time
+import os
+
+from rag_pipeline.embeddings import SharedEmbeddings, get_embeddings
+
+# --- Embedding Cache Settings ---
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 | float32
+
+
+class EmbeddingCache:
+    """
+    Content-addressed chunk embeddings for one model. Vectors are appended to
+    a flat `vectors.bin` file that is read through a memory map; a small
+    SQLite index maps sha256(model id + chunk text) to a row in that file.
+    Appends are serialized with a file lock, so several workers can share it.
+    Only rows recorded in SQLite count: bytes past them (an append torn by a
+    crash) are cut off before the next append, so rows never shift.
+    """
+
+    def __init__(self, root: str, model_id: str, dtype: str = EMBEDDING_CACHE_DTYPE):
+        model_key = hashlib.sha256(model_id.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(root, model_key)
+        os.makedirs(self.path, exist_ok=True)
+        self.model_id = model_id
+        self.dtype = np.dtype(dtype)
+        self.dim: Optional[int] = None
+        self._vectors_path = os.path.join(self.path, "vectors.bin")
+        self._meta_path = os.path.join(self.path, "meta.json")
+        self._lock = threading.Lock()
+        self._mmap: Optional[np.memmap] = None
+
+        self._db = sqlite3.connect(os.path.join(self.path, "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows (key BLOB PRIMARY KEY, row INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS rows_by_row ON rows (row)")
+        self._db.commit()
+        self._load_meta()
+
+    def _load_meta(self) -> bool:
+        """Read the dimension and dtype, which the first writer (maybe another worker) records."""
+        if self.dim is not None:
+            return True
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.dtype = np.dtype(meta["dtype"])
+        self.dim = meta["dim"]
+        return True
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_id}\0{text}".encode("utf-8")).digest()
+
+    def _rows_on_disk(self) -> int:
+        if self.dim is None or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * self.dtype.itemsize)
+
+    def _committed_rows(self) -> int:
+        """Rows the index refers to; the vectors file may hold more after a crash."""
+        (last_row,) = self._db.execute("SELECT MAX(row) FROM rows").fetchone()
+        return 0 if last_row is None else last_row + 1
+
+    def _vectors(self, min_rows: int) -> np.ndarray:
+        """Memory map covering at least `min_rows` rows, remapped when the file grew."""
+        if self._mmap is None or len(self._mmap) < min_rows:
+            rows = self._rows_on_disk()
+            self._mmap = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+        return self._mmap
+
+    def _lookup_rows(self, keys: List[bytes]) -> dict:
+        """key -> row for the keys present in the index."""
+        found = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self._db.execute(
+                f"SELECT key, row FROM rows WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached float32 vectors for `texts`, None where missing."""
+        if not texts or not self._load_meta():
+            return [None] * len(texts)
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            found = self._lookup_rows(keys)
+            if not found:
+                return [None] * len(texts)
+            vectors = self._vectors(max(found.values()) + 1)
+            return [
+                np.asarray(vectors[found[key]], dtype=np.float32) if key in found else None
+                for key in keys
+            ]
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Append new vectors; texts already in the cache are skipped."""
+        if not texts:
+            return
+        keys = [self._key(text) for text in texts]
+        with self._lock, open(os.path.join(self.path, "append.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not self._load_meta():
+                tmp_path = f"{self._meta_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"model_id": self.model_id, "dim": len(vectors[0]), "dtype": self.dtype.name}, f)
+                os.replace(tmp_path, self._meta_path)
+                self.dim = len(vectors[0])
+            array = np.asarray(vectors, dtype=self.dtype)
+            # Skip keys already stored (possibly by another worker) or repeated in this batch
+            seen = set(self._lookup_rows(keys))
+            new = []
+            for i, key in enumerate(keys):
+                if key not in seen:
+                    seen.add(key)
+                    new.append(i)
+            if not new:
+                return
+            first_row = self._committed_rows()
+            committed_bytes = first_row * self.dim * self.dtype.itemsize
+            if os.path.exists(self._vectors_path) and os.path.getsize(self._vectors_path) > committed_bytes:
+                # Drop a torn or unrecorded append, so the new rows land where the index says
+                os.truncate(self._vectors_path, committed_bytes)
+                self._mmap = None
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(array[new]).tobytes())
+            self._db.executemany(
+                "INSERT OR IGNORE INTO rows (key, row) VALUES (?, ?)",
+                [(keys[i], first_row + offset) for offset, i in enumerate(new)],
+            )
+            self._db.commit()
+
+
+class CachedEmbedder:
+    """
+    Embeds chunks through the cache: hits are read from disk, only misses go
+    through the model. Keeps per-instance stats, so use one per upload.
+    """
+
+    def __init__(self, cache: Optional[EmbeddingCache], embeddings: SharedEmbeddings):
+        self.cache = cache
+        self.embeddings = embeddings
+        self.hits = 0
+        self.misses = 0
+        self.embed_seconds = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(texts)
+            self.embed_seconds += time.perf_counter() - start
+            self.misses += len(texts)
+            return vectors
+
+        cached = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        results: List[List[float]] = [vector.tolist() if vector is not None else None for vector in cached]
+        if missing:
+            start = time.perf_counter()
+            new_vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.embed_seconds += time.perf_counter() - start
+            self.cache.put_many([texts[i] for i in missing], new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                results[i] = vector
+        return results
+
+    def stats(self) -> dict:
+        """Hit ratio and the embedding time the hits saved (at this upload's miss rate)."""
+        total = self.hits + self.misses
+        seconds_per_chunk = self.embed_seconds / self.misses if self.misses else None
+        if seconds_per_chunk is None:
+            rate = self.embeddings.stats()["texts_per_second"]
+            seconds_per_chunk = 1.0 / rate if rate else 0.0
+        return {
+            "embedding_cache_hits": self.hits,
+            "embedding_cache_hit_ratio": round(self.hits / total, 4) if total else None,
+            "embedding_seconds": round(self.embed_seconds, 3),
+            "embedding_seconds_saved": round(self.hits * seconds_per_chunk, 3),
+        }
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process-wide cache for the shared model, or None when disabled."""
+    global _embedding_cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _embedding_cache is None:
+        with _cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, get_embeddings().model_id)
+    return _embedding_cache
+
+
+def get_cached_embedder() -> CachedEmbedder:
+    """A fresh embedder (with its own stats) over the shared model and cache."""
+    return CachedEmbedder(get_embedding_cache(), get_embeddings())
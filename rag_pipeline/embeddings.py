@@ -0,0 +1,164 @@
+from langchain_core.embeddings import Embeddings
+from dotenv import load_dotenv
+from typing import List, Optional
+import threading
+import time
+import os
+
+load_dotenv()
+
+# --- Embedding Settings (overridable via .env) ---
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "models/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", "0"))  # 0 = torch default
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "true").lower() == "true"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx (see rag_pipeline/onnx_embeddings.py)
+
+
+class SharedEmbeddings(Embeddings):
+    """
+    A process-wide embedding engine around the local sentence-transformers model.
+    The model is loaded once (lazily, or eagerly via `load()`) and every
+    encode call is serialized behind a lock so concurrent uploads and queries
+    share the same weights without oversubscribing the CPU. With the "onnx"
+    backend the exported int8 model runs in ONNX Runtime instead of torch;
+    if it cannot be loaded the torch model is used.
+    """
+
+    def __init__(
+        self,
+        model_path: str = EMBEDDING_MODEL_PATH,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        num_threads: int = EMBEDDING_NUM_THREADS,
+        normalize: bool = EMBEDDING_NORMALIZE,
+        backend: str = EMBEDDING_BACKEND,
+    ):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.normalize = normalize
+        self.backend = backend
+        self.onnx_path: Optional[str] = None
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+        # Stats reported by `stats()`
+        self.load_seconds: Optional[float] = None
+        self.batches = 0
+        self.texts_embedded = 0
+        self.embed_seconds = 0.0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model_id(self) -> str:
+        """
+        Identifies the vectors this engine produces (used to namespace the
+        embedding cache). Loads the model first: the backend is only known
+        once loading has settled whether ONNX fell back to torch.
+        """
+        self.load()
+        model_id = f"{self.model_path}|normalize={self.normalize}"
+        if self.backend == "onnx":
+            model_id += f"|onnx={self.onnx_path}"
+        return model_id
+
+    def _load_onnx(self):
+        from rag_pipeline.onnx_embeddings import EMBEDDING_ONNX_PATH, OnnxEmbeddingModel
+
+        try:
+            model = OnnxEmbeddingModel(EMBEDDING_ONNX_PATH, num_threads=self.num_threads)
+        except Exception as e:
+            print(f"⚠️ ONNX embedding model unavailable at '{EMBEDDING_ONNX_PATH}' ({e}); using torch instead")
+            self.backend = "torch"
+            return None
+        self.onnx_path = EMBEDDING_ONNX_PATH
+        return model
+
+    def load(self):
+        """Load the model weights if they are not loaded yet."""
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                start = time.perf_counter()
+                model = self._load_onnx() if self.backend == "onnx" else None
+                if model is None:
+                    from sentence_transformers import SentenceTransformer
+                    import torch
+
+                    if self.num_threads > 0:
+                        torch.set_num_threads(self.num_threads)
+                    model = SentenceTransformer(self.model_path, device="cpu")
+                self._model = model
+                self.load_seconds = time.perf_counter() - start
+                source = self.onnx_path if self.backend == "onnx" else self.model_path
+                print(f"✅ Embedding model loaded from '{source}' ({self.backend}) in {self.load_seconds:.2f}s")
+        return self._model
+
+    def _encode(self, texts: List[str], log: bool = True) -> List[List[float]]:
+        model = self.load()
+        texts = [text.replace("\n", " ") for text in texts]
+        with self._encode_lock:
+            start = time.perf_counter()
+            vectors = model.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=self.normalize,
+                show_progress_bar=False,
+            )
+            elapsed = time.perf_counter() - start
+            self.batches += 1
+            self.texts_embedded += len(texts)
+            self.embed_seconds += elapsed
+        if log and len(texts) > 1:
+            rate = len(texts) / elapsed if elapsed > 0 else float("inf")
+            print(f"🧮 Embedded {len(texts)} texts in {elapsed:.2f}s ({rate:.1f} texts/s)")
+        return vectors.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of chunk texts."""
+        if not texts:
+            return []
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single question."""
+        return self._encode([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of questions from concurrent requests in one forward pass."""
+        if not texts:
+            return []
+        return self._encode(texts, log=False)
+
+    def stats(self) -> dict:
+        """Load time and cumulative throughput of the shared model."""
+        return {
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "loaded": self.is_loaded,
+            "load_seconds": self.load_seconds,
+            "batches": self.batches,
+            "texts_embedded": self.texts_embedded,
+            "embed_seconds": round(self.embed_seconds, 4),
+            "texts_per_second": round(self.texts_embedded / self.embed_seconds, 2) if self.embed_seconds else None,
+            "padding_ratio": self._model.padding_ratio() if hasattr(self._model, "padding_ratio") else None,
+        }
+
+
+_shared_embeddings: Optional[SharedEmbeddings] = None
+_shared_lock = threading.Lock()
+
+
+def get_embeddings() -> SharedEmbeddings:
+    """Return the process-wide embedding engine, creating it on first use."""
+    global _shared_embeddings
+    if _shared_embeddings is None:
+        with _shared_lock:
+            if _shared_embeddings is None:
+                _shared_embeddings = SharedEmbeddings()
+    return _shared_embeddings
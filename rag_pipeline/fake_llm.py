@@ -0,0 +1,67 @@
+from typing import AsyncIterator, Optional
+import asyncio
+import random
+import os
+
+# --- Fake LLM Settings (LLM_PROVIDER=fake) ---
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "200"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+FAKE_LLM_ANSWER = os.getenv(
+    "FAKE_LLM_ANSWER", "This is a canned answer from the fake LLM, generated from the retrieved context."
+)
+
+
+class FakeLLMError(Exception):
+    """Injected failure, shaped like a transient 503 from the real API."""
+
+    code = 503
+
+
+class FakeDocumentChain:
+    """
+    Offline stand-in for the Gemini document chain: same inputs ({'input',
+    'context'}), same string output, with configurable latency, jitter,
+    streaming speed and error rate. Used for load tests and for exercising
+    the LLM gateway without network access or an API key.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        jitter_ms: float = FAKE_LLM_JITTER_MS,
+        error_rate: float = FAKE_LLM_ERROR_RATE,
+        tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND,
+        answer: str = FAKE_LLM_ANSWER,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        self.answer = answer
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    async def _first_token_delay(self):
+        self.calls += 1
+        delay_ms = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(delay_ms / 1000)
+        if self._random.random() < self.error_rate:
+            raise FakeLLMError("Injected fake LLM failure")
+
+    async def ainvoke(self, inputs: dict, config=None) -> str:
+        await self._first_token_delay()
+        return self.answer
+
+    async def astream(self, inputs: dict, config=None) -> AsyncIterator[str]:
+        await self._first_token_delay()
+        words = self.answer.split(" ")
+        for i, word in enumerate(words):
+            if i and self.tokens_per_second > 0:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield word if i == 0 else " " + word
+
+    def invoke(self, inputs: dict, config=None) -> str:
+        return asyncio.run(self.ainvoke(inputs))
@@ -0,0 +1,85 @@
+from langchain_core.documents import Document
+from typing import Dict, List, Optional
+import numpy as np
+import faiss
+import os
+
+from rag_pipeline.vectorstore import DocumentIndex
+
+# --- Incremental Re-index Settings ---
+INCREMENTAL_REINDEX = os.getenv("INCREMENTAL_REINDEX", "true").lower() == "true"
+
+# Index types that hold the vectors exactly as embedded; sq8 and PQ codes only approximate them
+_EXACT_INDEX_TYPES = (faiss.IndexFlat, faiss.IndexIVFFlat, faiss.IndexHNSWFlat)
+
+
+class PreviousVersion:
+    """
+    The stored index of the content a filename pointed at before a re-upload.
+    Pages of the new PDF whose text hash matches one of its pages take that
+    page's chunks and vectors instead of being split and embedded again.
+    Pages that were deleted are simply not carried over into the new index.
+    """
+
+    def __init__(self, document_index: DocumentIndex):
+        self.document_index = document_index
+        self.old_pages: Dict[str, int] = {}  # page hash -> old page number
+        for page, digest in enumerate(document_index.page_hashes or []):
+            self.old_pages.setdefault(digest, page)
+        self.vectors: Dict[str, np.ndarray] = {}  # chunk text -> carried-over vector
+        self.pages_reused = 0
+
+    def chunks_for(self, page: Document, digest: str) -> Optional[List[Document]]:
+        """The old chunks of an unchanged page, renumbered to its new position; None if it changed."""
+        old_page = self.old_pages.get(digest)
+        if old_page is None:
+            return None
+        ids = self.document_index.page_to_ids.get(old_page, [])
+        with self.document_index.lock:
+            old_chunks = [self.document_index._document(vector_id) for vector_id in ids]
+            vectors = self._reconstruct(ids)
+        chunks = []
+        for i, old in enumerate(old_chunks):
+            chunks.append(Document(page_content=old.page_content, metadata={**old.metadata, **page.metadata}))
+            if vectors is not None:
+                self.vectors[old.page_content] = vectors[i]
+        self.pages_reused += 1
+        return chunks
+
+    def _reconstruct(self, ids: List[int]) -> Optional[np.ndarray]:
+        """
+        The stored vectors of `ids`, or None if the index only keeps lossy
+        codes: copying those would compound the quantization error on every
+        re-upload, so the chunks go to the embedder (and its cache) instead.
+        """
+        index = self.document_index.vector_store.index
+        if not ids or not isinstance(index, _EXACT_INDEX_TYPES):
+            return None
+        try:
+            return index.reconstruct_batch(np.array(ids, dtype=np.int64))
+        except RuntimeError:
+            # No direct map to reconstruct from: the chunks are embedded again
+            return None
+
+
+class ReusingEmbedder:
+    """Wraps an upload's embedder so chunks carried over from the previous version keep their vectors."""
+
+    def __init__(self, embedder, previous: PreviousVersion):
+        self.embedder = embedder
+        self.previous = previous
+        self.reused = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Popped, so carried-over vectors are only held until their batch is embedded
+        results = [self.previous.vectors.pop(text, None) for text in texts]
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        self.reused += len(texts) - len(missing)
+        results = [vector.tolist() if vector is not None else None for vector in results]
+        if missing:
+            for i, vector in zip(missing, self.embedder.embed_documents([texts[i] for i in missing])):
+                results[i] = vector
+        return results
+
+    def stats(self) -> dict:
+        return {**self.embedder.stats(), "chunks_reused": self.reused}
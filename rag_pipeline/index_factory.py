@@ -0,0 +1,96 @@
+import numpy as np
+import faiss
+import math
+import os
+
+# --- Index Type Settings ---
+# auto | flat | sq8 | hnsw | ivf | ivfpq
+INDEX_TYPE = os.getenv("INDEX_TYPE", "auto")
+# With INDEX_TYPE=auto: flat below this many chunks...
+INDEX_AUTO_FLAT_MAX = int(os.getenv("INDEX_AUTO_FLAT_MAX", "10000"))
+# ...IVF up to this many, and IVF-PQ (compressed) above it
+INDEX_AUTO_IVFPQ_MIN = int(os.getenv("INDEX_AUTO_IVFPQ_MIN", "100000"))
+INDEX_IVF_NPROBE = int(os.getenv("INDEX_IVF_NPROBE", "16"))
+INDEX_HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))
+INDEX_HNSW_EF_SEARCH = int(os.getenv("INDEX_HNSW_EF_SEARCH", "64"))
+INDEX_PQ_SUBVECTORS = int(os.getenv("INDEX_PQ_SUBVECTORS", "48"))
+
+INDEX_TYPES = ("flat", "sq8", "hnsw", "ivf", "ivfpq")
+
+if INDEX_TYPE != "auto" and INDEX_TYPE not in INDEX_TYPES:
+    # Fail at startup, not when the first upload finishes and is compacted
+    raise ValueError(f"Unknown INDEX_TYPE '{INDEX_TYPE}'. Use auto or one of {', '.join(INDEX_TYPES)}.")
+
+# FAISS wants ~39 training points per centroid
+_POINTS_PER_CENTROID = 39
+
+
+def choose_index_type(num_vectors: int, index_type: str = INDEX_TYPE) -> str:
+    """Resolve `auto` to a concrete index type for a document of this size."""
+    if index_type != "auto":
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown INDEX_TYPE '{index_type}'. Use auto or one of {', '.join(INDEX_TYPES)}.")
+        return index_type
+    if num_vectors < INDEX_AUTO_FLAT_MAX:
+        return "flat"
+    if num_vectors < INDEX_AUTO_IVFPQ_MIN:
+        return "ivf"
+    return "ivfpq"
+
+
+def _nlist(num_vectors: int) -> int:
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // _POINTS_PER_CENTROID))
+
+
+def build_faiss_index(vectors: np.ndarray, index_type: str) -> faiss.Index:
+    """
+    Build and fill an L2 index of the given type from float32 vectors.
+    Types that cannot be trained on this few vectors fall back to flat.
+    IVF indexes get a direct map so page-range subset search can reconstruct.
+    """
+    num_vectors, dimension = vectors.shape
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    if index_type == "ivfpq" and (
+        dimension % INDEX_PQ_SUBVECTORS or num_vectors < 256 * _POINTS_PER_CENTROID
+    ):
+        index_type = "ivf"
+    if index_type == "ivf" and num_vectors < 4 * _POINTS_PER_CENTROID:
+        index_type = "flat"
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, INDEX_HNSW_M)
+        index.hnsw.efSearch = INDEX_HNSW_EF_SEARCH
+    elif index_type in ("ivf", "ivfpq"):
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, _nlist(num_vectors))
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, _nlist(num_vectors), INDEX_PQ_SUBVECTORS, 8)
+        index.nprobe = INDEX_IVF_NPROBE
+    else:
+        raise ValueError(f"Unknown index type '{index_type}'.")
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index
+
+
+def index_type_name(index: faiss.Index) -> str:
+    """Short name of an index's type, matching INDEX_TYPES."""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq8"
+    return "flat"
@@ -0,0 +1,160 @@
+from langchain_community.vectorstores import FAISS
+from typing import Dict, Optional
+import numpy as np
+import hashlib
+import shutil
+import pickle
+import json
+import uuid
+import faiss
+import os
+
+from rag_pipeline.embeddings import get_embeddings
+from rag_pipeline.vectorstore import DocumentIndex
+from rag_pipeline.lexical_index import LexicalIndex
+from rag_pipeline.chunk_store import ChunkStore, has_chunk_store, write_chunk_store
+from rag_pipeline.document_collections import COLLECTION_ROUTE_CENTROIDS
+
+# --- Index Store Settings ---
+INDEX_STORE_DIR = os.getenv("INDEX_STORE_DIR", "index_store")
+INDEX_STORE_MMAP = os.getenv("INDEX_STORE_MMAP", "true").lower() == "true"
+
+PAGE_HASHES_FILE = "page_hashes.json"
+ROUTING_CENTROIDS_FILE = "routing_centroids.npy"
+
+
+def _mmap_flags(index_path: str) -> int:
+    """
+    Read flags that memory-map a stored index: IVF lists are mapped by
+    IO_FLAG_MMAP, flat / scalar-quantized codes by IO_FLAG_MMAP_IFC (FAISS >= 1.11).
+    FAISS refuses IVF files read with both, so the index's type tag picks one.
+    """
+    with open(index_path, "rb") as f:
+        fourcc = f.read(4)
+    mmap_flag = faiss.IO_FLAG_MMAP if fourcc[:2] in (b"Iw", b"Iv") else faiss.IO_FLAG_MMAP_IFC
+    return mmap_flag | faiss.IO_FLAG_READ_ONLY
+
+
+class IndexStore:
+    """
+    Persists each document's FAISS index and chunk store under
+    `<root>/docs/<content hash>/`, plus one small pointer file per filename
+    under `<root>/names/`. Nothing is read at startup: pointers and indexes
+    are only opened when a document is first asked for. Stored documents
+    are immutable and opened read-only and memory-mapped, so uvicorn workers
+    serving the same document share one copy in the page cache.
+    Each document's routing centroids are saved in a small file of their own,
+    so collection questions can be routed without opening any index.
+    """
+
+    def __init__(self, root: str = INDEX_STORE_DIR):
+        self.root = root
+        self.docs_dir = os.path.join(root, "docs")
+        self.names_dir = os.path.join(root, "names")
+        os.makedirs(self.docs_dir, exist_ok=True)
+        os.makedirs(self.names_dir, exist_ok=True)
+        self._routing_centroids: Dict[str, np.ndarray] = {}  # stored documents never change
+
+    def _doc_path(self, content_hash: str) -> str:
+        return os.path.join(self.docs_dir, content_hash)
+
+    def _name_path(self, filename: str) -> str:
+        name_key = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+        return os.path.join(self.names_dir, f"{name_key}.json")
+
+    def has(self, content_hash: str) -> bool:
+        return os.path.isdir(self._doc_path(content_hash))
+
+    def save(self, content_hash: str, document_index: DocumentIndex):
+        """Write the index atomically: build in a temp dir, then rename into place."""
+        if not document_index.complete:
+            # A stored index is final: later uploads of the same bytes would reuse it as is
+            raise ValueError("Refusing to store a partially built index.")
+        if self.has(content_hash):
+            return
+        tmp_path = os.path.join(self.docs_dir, f".tmp-{uuid.uuid4().hex}")
+        store = document_index.vector_store
+        os.makedirs(tmp_path)
+        with document_index.lock:
+            faiss.write_index(store.index, os.path.join(tmp_path, "index.faiss"))
+            documents = [store.docstore.search(store.index_to_docstore_id[i]) for i in range(store.index.ntotal)]
+            write_chunk_store(tmp_path, documents)
+            document_index.lexical_index.save(tmp_path)
+            if document_index.page_hashes is not None:
+                with open(os.path.join(tmp_path, PAGE_HASHES_FILE), "w") as f:
+                    json.dump(document_index.page_hashes, f)
+            centroids = document_index.routing_centroids(COLLECTION_ROUTE_CENTROIDS)
+            if centroids is not None:
+                np.save(os.path.join(tmp_path, ROUTING_CENTROIDS_FILE), centroids)
+        try:
+            os.rename(tmp_path, self._doc_path(content_hash))
+        except OSError:
+            # Another worker saved the same content first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def load(self, content_hash: str) -> DocumentIndex:
+        """Open a stored index; the vectors and chunk text are memory-mapped when enabled."""
+        path = self._doc_path(content_hash)
+        index_path = os.path.join(path, "index.faiss")
+        index = faiss.read_index(index_path, _mmap_flags(index_path) if INDEX_STORE_MMAP else 0)
+        pages = None
+        if has_chunk_store(path):
+            docstore = ChunkStore(path)
+            index_to_docstore_id = docstore.ids
+            pages = docstore.pages
+        else:
+            # Stored by an older version with LangChain's pickled docstore
+            with open(os.path.join(path, "index.pkl"), "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        vector_store = FAISS(
+            embedding_function=get_embeddings(),
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+        document_index = DocumentIndex(
+            vector_store, content_hash=content_hash, lexical_index=LexicalIndex.load(path), pages=pages
+        )
+        page_hashes_path = os.path.join(path, PAGE_HASHES_FILE)
+        if os.path.exists(page_hashes_path):
+            with open(page_hashes_path) as f:
+                document_index.page_hashes = json.load(f)
+        print(f"📂 Loaded stored index {content_hash[:12]}")
+        return document_index
+
+    def routing_centroids(self, content_hash: str) -> Optional[np.ndarray]:
+        """A stored document's routing centroids, or None if it was saved without them."""
+        centroids = self._routing_centroids.get(content_hash)
+        if centroids is None:
+            try:
+                centroids = np.load(os.path.join(self._doc_path(content_hash), ROUTING_CENTROIDS_FILE))
+            except OSError:
+                return None
+            self._routing_centroids[content_hash] = centroids
+        return centroids
+
+    def save_routing_centroids(self, content_hash: str, centroids: np.ndarray):
+        """Add routing centroids to a document stored before they were saved with it."""
+        path = os.path.join(self._doc_path(content_hash), ROUTING_CENTROIDS_FILE)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, centroids)
+        os.replace(tmp_path, path)
+        self._routing_centroids[content_hash] = centroids
+
+    def link(self, filename: str, content_hash: str):
+        """Point a filename at the content it was last uploaded with."""
+        path = self._name_path(filename)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"filename": filename, "content_hash": content_hash}, f)
+        os.replace(tmp_path, path)
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """Content hash last linked to a filename, if any."""
+        try:
+            with open(self._name_path(filename)) as f:
+                content_hash = json.load(f)["content_hash"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return content_hash if self.has(content_hash) else None
@@ -0,0 +1,285 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Callable, Optional, Union
+import threading
+import time
+import uuid
+import os
+
+from utils.document_loader import iter_chunks
+from utils.pdf_utils import get_page_count
+from utils.upload_spool import SpooledUpload
+from rag_pipeline.vectorstore import DocumentIndex, build_document_index
+from rag_pipeline.index_store import IndexStore
+from rag_pipeline.embedding_cache import get_cached_embedder
+from rag_pipeline.metrics import UPLOAD_STAGE_SECONDS, observe_stages
+from rag_pipeline.job_registry import JOB_PUBLISH_INTERVAL, JobRegistry, RemoteJob
+from rag_pipeline.incremental import INCREMENTAL_REINDEX, PreviousVersion, ReusingEmbedder
+from rag_pipeline.document_collections import COLLECTION_ROUTE_CENTROIDS
+
+# --- Ingestion Settings ---
+INGEST_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "2"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "16"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+
+class IngestQueueFull(Exception):
+    """Raised when too many uploads are already queued."""
+
+
+class IngestJob:
+    """Progress of one background upload: queued -> indexing -> ready."""
+
+    def __init__(self, filename: str, pages_total: int, content_hash: str, previous_content_hash: Optional[str] = None):
+        self.job_id = uuid.uuid4().hex
+        self.filename = filename
+        self.content_hash = content_hash
+        self.previous_content_hash = previous_content_hash  # what the filename pointed at before
+        self.reused = False
+        self.status = "queued"  # queued | indexing | ready | failed
+        self.error: Optional[str] = None
+        self.pages_total = pages_total
+        self.pages_parsed = 0
+        self.pages_indexed = 0  # pages whose chunks are all searchable
+        self.pages_reused = 0  # unchanged pages carried over from the previous version
+        self.pages_reembedded = 0
+        self.chunks_embedded = 0
+        self.embedding_stats: dict = {}
+        self.index_type: Optional[str] = None
+        self.timings: dict = {}  # <stage>_ms: read, parse, split, embed, index, compact, persist, total
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.published_at = 0.0  # last snapshot written to the job registry (monotonic)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("ready", "failed")
+
+    def eta_seconds(self) -> Optional[float]:
+        """Rough time to completion from the observed page rate."""
+        if self.done:
+            return 0.0
+        if self.started_at is None or self.pages_parsed == 0:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining_pages = self.pages_total - self.pages_indexed
+        return round(remaining_pages * elapsed / max(self.pages_indexed, self.pages_parsed, 1), 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "filename": self.filename,
+            "content_hash": self.content_hash,
+            "previous_content_hash": self.previous_content_hash,
+            "reused": self.reused,
+            "status": self.status,
+            "error": self.error,
+            "pages_total": self.pages_total,
+            "pages_parsed": self.pages_parsed,
+            "pages_indexed": self.pages_indexed,
+            "pages_reused": self.pages_reused,
+            "pages_reembedded": self.pages_reembedded,
+            "chunks_embedded": self.chunks_embedded,
+            **self.embedding_stats,
+            "index_type": self.index_type,
+            "timings": {key: round(value, 1) for key, value in self.timings.items()},
+            "eta_seconds": self.eta_seconds(),
+            "elapsed_seconds": round((self.finished_at or time.time()) - (self.started_at or self.created_at), 2),
+        }
+
+
+class IngestManager:
+    """
+    Runs PDF parsing and embedding on a bounded thread pool so uploads never
+    block the event loop. Pages stream into the index batch by batch: the
+    partially built index is handed to `on_update` after every batch (so
+    early pages can be queried) and again once complete, after it has been
+    persisted to the index store. If the job fails after that, the partial
+    index is handed to `on_discard` instead. Identical bytes skip the pipeline,
+    and a revised PDF re-uploaded under the same filename only splits and
+    embeds the pages whose text changed.
+    Job progress is published to a registry next to the index store, so
+    any worker can answer status polls and 409s for uploads it is not running.
+    """
+
+    def __init__(
+        self,
+        index_store: IndexStore,
+        max_workers: int = INGEST_MAX_WORKERS,
+        max_pending: int = INGEST_MAX_PENDING,
+    ):
+        self.index_store = index_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.max_pending = max_pending
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self.registry = JobRegistry(index_store.root)
+        self._lock = threading.Lock()
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.done)
+
+    def submit(
+        self,
+        upload: SpooledUpload,
+        filename: str,
+        on_update: Callable[[str, DocumentIndex], None],
+        timings: Optional[dict] = None,
+        on_discard: Optional[Callable[[str, DocumentIndex], None]] = None,
+    ) -> IngestJob:
+        """
+        Queue an upload and return its job immediately. The job owns `upload`
+        from then on and deletes it when done; if this raises, the caller still
+        does. `timings` seeds the job's stages (e.g. read_ms).
+        """
+        digest = upload.content_hash
+        with self._lock:
+            if self.pending_count() >= self.max_pending:
+                raise IngestQueueFull(f"{self.max_pending} uploads are already being processed.")
+            job = IngestJob(filename, get_page_count(upload.path), digest, self.index_store.lookup(filename))
+            job.timings.update(timings or {})
+            self.jobs[job.job_id] = job
+            self._prune()
+
+        if self.index_store.has(digest):
+            # Same bytes were indexed before: just point the filename at them
+            self.index_store.link(filename, digest)
+            job.reused = True
+            job.status = "ready"
+            job.pages_parsed = job.pages_indexed = job.pages_reused = job.pages_total
+            job.started_at = job.finished_at = time.time()
+            print(f"♻️ Reusing stored index for {filename} ({digest[:12]})")
+            observe_stages(UPLOAD_STAGE_SECONDS, job.timings)
+            self._publish(job)
+            upload.close()
+            return job
+
+        self._publish(job)
+        self._executor.submit(self._run, job, upload, on_update, on_discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[Union[IngestJob, RemoteJob]]:
+        """A job of this worker, or of another one as it last published itself."""
+        return self.jobs.get(job_id) or self.registry.get(job_id)
+
+    def active_job_for(self, filename: str) -> Optional[Union[IngestJob, RemoteJob]]:
+        """The newest unfinished job for a filename, if any, in any worker."""
+        for job in reversed(list(self.jobs.values())):
+            if job.filename == filename and not job.done:
+                return job
+        return self.registry.active_job_for(filename)
+
+    def _publish(self, job: IngestJob, force: bool = True):
+        now = time.monotonic()
+        if force or now - job.published_at >= JOB_PUBLISH_INTERVAL:
+            job.published_at = now
+            try:
+                self.registry.publish(job.to_dict())
+            except OSError as e:
+                print(f"⚠️ Could not publish upload job {job.job_id}: {e}")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(self.jobs) - INGEST_JOB_HISTORY)]:
+            del self.jobs[job_id]
+            self.registry.forget(job_id)
+
+    def _run(
+        self,
+        job: IngestJob,
+        upload: SpooledUpload,
+        on_update: Callable[[str, DocumentIndex], None],
+        on_discard: Optional[Callable[[str, DocumentIndex], None]],
+    ):
+        job.started_at = time.time()
+        published: Optional[DocumentIndex] = None  # the partial index handed to on_update
+        try:
+            job.status = "indexing"
+            self._publish(job)
+            embedder = get_cached_embedder()
+            previous = self._previous_version(job)
+            if previous is not None:
+                embedder = ReusingEmbedder(embedder, previous)
+
+            def on_page(pages_parsed: int):
+                job.pages_parsed = pages_parsed
+                job.pages_reused = previous.pages_reused if previous is not None else 0
+                job.pages_reembedded = pages_parsed - job.pages_reused
+
+            def on_batch(document_index: DocumentIndex, batch: list):
+                job.chunks_embedded += len(batch)
+                job.embedding_stats = embedder.stats()
+                # The last page in the batch may continue into the next one
+                job.pages_indexed = max(job.pages_indexed, batch[-1].metadata["page"])
+                nonlocal published
+                document_index.content_hash = job.content_hash
+                published = document_index
+                on_update(job.filename, document_index)
+                self._publish(job, force=False)
+
+            page_hashes = []
+            chunks = iter_chunks(
+                upload.path, job.filename, on_page=on_page, timings=job.timings, page_hashes=page_hashes,
+                reuse=previous.chunks_for if previous is not None else None,
+            )
+            try:
+                document_index = build_document_index(
+                    chunks, on_batch=on_batch, embedder=embedder, timings=job.timings
+                )
+            finally:
+                job.embedding_stats = embedder.stats()
+            if document_index is None:
+                raise ValueError("Could not extract text from the PDF.")
+            document_index.page_hashes = page_hashes
+            # Routing centroids come from the exact vectors, before compaction; they are stored with the index
+            document_index.routing_centroids(COLLECTION_ROUTE_CENTROIDS)
+
+            job.pages_indexed = job.pages_total
+            start = time.perf_counter()
+            job.index_type = document_index.compact()
+            job.timings["compact_ms"] = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            self.index_store.save(job.content_hash, document_index)
+            self.index_store.link(job.filename, job.content_hash)
+            job.timings["persist_ms"] = (time.perf_counter() - start) * 1000
+            on_update(job.filename, document_index)
+            self._finish(job, "ready")
+            stats = job.embedding_stats
+            print(
+                f"✅ Uploaded and processed PDF: {job.filename} ({job.chunks_embedded} chunks, "
+                f"{stats['embedding_cache_hits']} from embedding cache, ~{stats['embedding_seconds_saved']}s saved)"
+            )
+            if previous is not None:
+                print(f"♻️ Reused {job.pages_reused} unchanged pages, re-embedded {job.pages_reembedded}")
+        except Exception as e:
+            job.error = str(e)
+            if published is not None and on_discard is not None:
+                # Stop serving answers from an index that will never be finished
+                on_discard(job.filename, published)
+            self._finish(job, "failed")
+            print(f"❌ Failed to process PDF {job.filename}: {e}")
+        finally:
+            upload.close()
+
+    def _previous_version(self, job: IngestJob) -> Optional[PreviousVersion]:
+        """The filename's previous index, if it can seed an incremental re-index."""
+        if not INCREMENTAL_REINDEX or job.previous_content_hash is None:
+            return None
+        try:
+            document_index = self.index_store.load(job.previous_content_hash)
+        except Exception as e:
+            print(f"⚠️ Could not open the previous index of {job.filename}, re-indexing every page: {e}")
+            return None
+        if document_index.page_hashes is None:
+            # Stored before page hashes were recorded
+            return None
+        return PreviousVersion(document_index)
+
+    def _finish(self, job: IngestJob, status: str):
+        # Timings first, so a client that sees the final status also sees the total
+        job.finished_at = time.time()
+        job.timings["total_ms"] = (job.finished_at - job.started_at) * 1000
+        observe_stages(UPLOAD_STAGE_SECONDS, job.timings)
+        job.status = status
+        self._publish(job)
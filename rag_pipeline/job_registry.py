@@ -0,0 +1,110 @@
+from typing import Optional
+import hashlib
+import json
+import uuid
+import os
+
+# --- Job Registry Settings ---
+JOB_PUBLISH_INTERVAL = float(os.getenv("JOB_PUBLISH_INTERVAL", "0.5"))  # seconds between progress snapshots
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RemoteJob:
+    """An upload job owned by another worker process, as it last published itself."""
+
+    def __init__(self, snapshot: dict):
+        self.snapshot = snapshot
+
+    @property
+    def job_id(self) -> str:
+        return self.snapshot["job_id"]
+
+    @property
+    def status(self) -> str:
+        return self.snapshot["status"]
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("ready", "failed")
+
+    def to_dict(self) -> dict:
+        return self.snapshot
+
+
+class JobRegistry:
+    """
+    Lets every uvicorn worker see the upload jobs of the others: each job's
+    latest `to_dict()` snapshot is written to `<root>/jobs/<job id>.json`, and
+    `<root>/ingesting/` points each filename at the job still indexing it.
+    Jobs whose worker process has died are reported as failed.
+    """
+
+    def __init__(self, root: str):
+        self.jobs_dir = os.path.join(root, "jobs")
+        self.active_dir = os.path.join(root, "ingesting")
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        os.makedirs(self.active_dir, exist_ok=True)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _active_path(self, filename: str) -> str:
+        name_key = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+        return os.path.join(self.active_dir, f"{name_key}.json")
+
+    @staticmethod
+    def _write(path: str, data: dict):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path: str) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def publish(self, snapshot: dict):
+        """Record a job's state; call on every status change and periodically while it runs."""
+        self._write(self._job_path(snapshot["job_id"]), {**snapshot, "pid": os.getpid()})
+        active_path = self._active_path(snapshot["filename"])
+        if snapshot["status"] in ("ready", "failed"):
+            active = self._read(active_path)
+            if active is not None and active["job_id"] == snapshot["job_id"]:
+                try:
+                    os.remove(active_path)
+                except OSError:
+                    pass
+        else:
+            self._write(active_path, {"job_id": snapshot["job_id"]})
+
+    def get(self, job_id: str) -> Optional[RemoteJob]:
+        snapshot = self._read(self._job_path(job_id))
+        if snapshot is None:
+            return None
+        if snapshot["status"] not in ("ready", "failed") and not _process_alive(snapshot["pid"]):
+            snapshot = {**snapshot, "status": "failed", "error": "The worker processing this upload stopped."}
+        return RemoteJob(snapshot)
+
+    def active_job_for(self, filename: str) -> Optional[RemoteJob]:
+        active = self._read(self._active_path(filename))
+        job = self.get(active["job_id"]) if active is not None else None
+        return job if job is not None and not job.done else None
+
+    def forget(self, job_id: str):
+        try:
+            os.remove(self._job_path(job_id))
+        except OSError:
+            pass
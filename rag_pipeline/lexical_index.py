@@ -0,0 +1,195 @@
+from langchain_core.documents import Document
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import threading
+import math
+import re
+import os
+
+# --- Hybrid Retrieval Settings ---
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # hits taken from each retriever
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))  # dense weight is 1.0
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+LEXICAL_FILENAME = "lexical.npz"
+
+# Words plus identifiers such as "AB-1234", "E.404" or "4.2.1"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased tokens; compound identifiers are kept whole and also split into parts."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over a document's chunks, keyed by FAISS vector id.
+    Postings live in a frozen snapshot of CSR arrays (int32 doc ids, uint16
+    term frequencies), so a query costs a few vectorised numpy operations
+    per query term. Chunks that stream in while a PDF is ingested go to a
+    pending delta of dicts that queries read alongside the snapshot; the two
+    are only merged by `freeze()`, once the document is complete.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, List[Tuple[int, int]]] = {}
+        self._pending_lengths: List[int] = []
+        self._pending_postings = 0
+        self.vocab: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths) + len(self._pending_lengths)
+
+    def nbytes(self) -> int:
+        vocab_bytes = sum(len(term) + 60 for term in self.vocab)
+        arrays = (self.offsets, self.doc_ids, self.tfs, self.doc_lengths)
+        # A pending posting is a tuple of two ints in a list
+        pending_bytes = sum(len(term) + 60 for term in self._pending) + self._pending_postings * 80
+        return vocab_bytes + sum(array.nbytes for array in arrays) + pending_bytes
+
+    def add(self, documents: List[Document], first_id: int):
+        """Index chunks whose vector ids are first_id, first_id + 1, ... into the pending delta."""
+        with self._lock:
+            if first_id != self.num_docs:
+                raise ValueError(f"Expected vector id {self.num_docs}, got {first_id}.")
+            for offset, doc in enumerate(documents):
+                tokens = tokenize(doc.page_content)
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    self._pending.setdefault(token, []).append((first_id + offset, min(count, 65535)))
+                self._pending_postings += len(counts)
+                self._pending_lengths.append(len(tokens))
+
+    def freeze(self):
+        """Merge the pending delta into the CSR snapshot."""
+        with self._lock:
+            if not self._pending_lengths:
+                return
+            terms = sorted(set(self.vocab).union(self._pending))
+            vocab = {term: term_id for term_id, term in enumerate(terms)}
+            # Label every posting with its new term id; a stable sort keeps doc ids
+            # ascending within a term, as snapshot ids all precede the pending ones
+            snapshot_terms = np.array([vocab[term] for term in sorted(self.vocab, key=self.vocab.get)], dtype=np.int64)
+            pending_terms = sorted(self._pending)
+            term_ids = np.concatenate([
+                np.repeat(snapshot_terms, np.diff(self.offsets)),
+                np.repeat(
+                    np.array([vocab[term] for term in pending_terms], dtype=np.int64),
+                    [len(self._pending[term]) for term in pending_terms],
+                ),
+            ])
+            postings = [posting for term in pending_terms for posting in self._pending[term]]
+            packed = np.array(postings, dtype=np.int64).reshape(-1, 2)
+            order = np.argsort(term_ids, kind="stable")
+            self.doc_ids = np.concatenate([self.doc_ids, packed[:, 0].astype(np.int32)])[order]
+            self.tfs = np.concatenate([self.tfs, packed[:, 1].astype(np.uint16)])[order]
+            self.offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=self.offsets[1:])
+            self.doc_lengths = np.concatenate([self.doc_lengths, np.array(self._pending_lengths, dtype=np.int32)])
+            self.vocab = vocab
+            self._pending, self._pending_lengths, self._pending_postings = {}, [], 0
+
+    def search(self, query: str, k: int, ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k BM25 scores and vector ids for the query, optionally restricted
+        to `ids`. Chunks sharing no term with the query are never returned.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            # A consistent view: the snapshot, plus the delta's postings for the query terms
+            vocab, offsets, doc_ids, tfs = self.vocab, self.offsets, self.doc_ids, self.tfs
+            doc_lengths = self.doc_lengths
+            if self._pending_lengths:
+                doc_lengths = np.concatenate([doc_lengths, np.array(self._pending_lengths, dtype=np.int32)])
+            pending = {term: list(self._pending[term]) for term in terms if term in self._pending}
+        num_docs = len(doc_lengths)
+        empty = (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64))
+        if num_docs == 0:
+            return empty
+
+        average_length = max(float(doc_lengths.mean()), 1.0)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / average_length)
+        scores = np.zeros(num_docs, dtype=np.float32)
+        for term in terms:
+            term_id = vocab.get(term)
+            if term_id is not None:
+                start, end = offsets[term_id], offsets[term_id + 1]
+                docs, tf = doc_ids[start:end], tfs[start:end].astype(np.float32)
+            else:
+                docs, tf = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+            if term in pending:
+                packed = np.array(pending[term], dtype=np.int64).reshape(-1, 2)
+                docs = np.concatenate([docs, packed[:, 0].astype(np.int32)])
+                tf = np.concatenate([tf, packed[:, 1].astype(np.float32)])
+            if len(docs) == 0:
+                continue
+            idf = math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + length_norm[docs])
+
+        candidates = np.arange(num_docs, dtype=np.int64) if ids is None else ids
+        candidate_scores = scores[candidates]
+        matched = candidate_scores > 0
+        candidates, candidate_scores = candidates[matched], candidate_scores[matched]
+        if len(candidates) == 0:
+            return empty
+        k = min(k, len(candidates))
+        top = np.argpartition(-candidate_scores, k - 1)[:k]
+        top = top[np.argsort(-candidate_scores[top])]
+        return candidate_scores[top], candidates[top]
+
+    def save(self, directory: str):
+        self.freeze()
+        np.savez(
+            os.path.join(directory, LEXICAL_FILENAME),
+            terms=np.array(sorted(self.vocab, key=self.vocab.get), dtype=str),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+        )
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["LexicalIndex"]:
+        """The saved index, or None for indexes stored before it existed."""
+        path = os.path.join(directory, LEXICAL_FILENAME)
+        if not os.path.exists(path):
+            return None
+        lexical_index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            lexical_index.vocab = {term: term_id for term_id, term in enumerate(data["terms"].tolist())}
+            lexical_index.offsets = data["offsets"]
+            lexical_index.doc_ids = data["doc_ids"]
+            lexical_index.tfs = data["tfs"]
+            lexical_index.doc_lengths = data["doc_lengths"]
+        return lexical_index
+
+
+def reciprocal_rank_fusion(
+    dense_ids: List[int], lexical_ids: List[int], k: int, rrf_k: int = HYBRID_RRF_K
+) -> List[Tuple[int, float]]:
+    """Fuse two ranked id lists into the top-k (id, score), higher scores first."""
+    scores: Dict[int, float] = {}
+    for rank, vector_id in enumerate(dense_ids):
+        scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    for rank, vector_id in enumerate(lexical_ids):
+        scores[vector_id] = scores.get(vector_id, 0.0) + HYBRID_LEXICAL_WEIGHT / (rrf_k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])[:k]
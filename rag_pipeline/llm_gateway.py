@@ -0,0 +1,358 @@
+from collections import deque
+from typing import AsyncIterator, Optional
+import numpy as np
+import asyncio
+import random
+import time
+import os
+
+# --- LLM Gateway Settings ---
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))  # 0 = unlimited
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))  # whole call, retries included
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per retry
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive failures to open
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Latency samples kept for the hedging threshold and the stats
+_LATENCY_WINDOW = 500
+# Error class names and status codes from the Gemini client that are worth retrying
+_RETRYABLE_NAMES = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests"}
+_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    """The LLM could not be called: circuit open, rate limit wait too long, or deadline hit."""
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _RETRYABLE_NAMES:
+        return True
+    code = getattr(error, "code", None)
+    code = code() if callable(code) else code
+    return getattr(code, "value", code) in _RETRYABLE_CODES
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, deadline: float) -> bool:
+        """Wait for a token; False if none would be available before `deadline`."""
+        while not self.try_acquire():
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures (the gateway
+    records only retryable ones, not client errors) and rejects calls for
+    `reset_seconds`; then lets one trial call through (half-open) and closes
+    again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        """Free the half-open slot of a trial call that ended without an outcome (e.g. cancelled)."""
+        self.trial_in_flight = False
+
+
+class LLMGateway:
+    """
+    Wraps the document chain so every LLM call goes through a bounded
+    concurrency semaphore, a token-bucket rate limiter, a per-call deadline
+    with jittered exponential-backoff retries, an optional hedged second
+    request once the call outlives the recent p95 latency, and a circuit
+    breaker that fails fast while the LLM is down. Exposes the chain's
+    `ainvoke` / `astream` so it can stand in for it.
+    """
+
+    def __init__(
+        self,
+        chain,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_second: float = LLM_RATE_PER_SECOND,
+        rate_burst: int = LLM_RATE_BURST,
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_delay: float = LLM_RETRY_BASE_DELAY,
+        hedge: bool = LLM_HEDGE_ENABLED,
+    ):
+        self.chain = chain
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.hedge = hedge
+        self.bucket = TokenBucket(rate_per_second, rate_burst)
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._latencies: deque = deque(maxlen=_LATENCY_WINDOW)
+
+        self.calls = 0
+        self.in_flight = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _hedge_after(self) -> Optional[float]:
+        if not self.hedge or len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(np.array(self._latencies), LLM_HEDGE_PERCENTILE))
+
+    def _reject(self, reason: str):
+        self.rejected += 1
+        raise LLMUnavailable(reason)
+
+    async def _admit(self, deadline: float) -> bool:
+        """
+        Circuit breaker, then rate limiter; the caller then takes the semaphore.
+        Returns True if this call is the breaker's half-open trial, which the
+        caller must release if the call ends without recording an outcome.
+        """
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self._reject("The answer service is temporarily unavailable. Please try again shortly.")
+        try:
+            admitted = await self.bucket.acquire(deadline)
+        except BaseException:
+            if trial:
+                self.breaker.release_trial()
+            raise
+        if not admitted:
+            if trial:
+                self.breaker.release_trial()
+            self._reject("Too many questions right now. Please try again in a moment.")
+        return trial
+
+    async def _backoff(self, attempt: int, deadline: float) -> bool:
+        """Sleep a jittered exponential delay; False if it would pass the deadline."""
+        delay = random.uniform(0, self.retry_base_delay * (2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        self.retries += 1
+        await asyncio.sleep(delay)
+        return True
+
+    async def _hedged_call(self, inputs: dict, deadline: float) -> str:
+        """One attempt, plus a second identical request if the first is slower than p95."""
+        primary = asyncio.ensure_future(self.chain.ainvoke(inputs))
+        tasks = [primary]
+        try:
+            hedge_after = self._hedge_after()
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=min(hedge_after, max(0.0, deadline - time.monotonic())))
+                if not done and self.bucket.try_acquire():
+                    self.hedges += 1
+                    tasks.append(asyncio.ensure_future(self.chain.ainvoke(inputs)))
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def ainvoke(self, inputs: dict, config=None) -> str:
+        deadline = time.monotonic() + self.timeout_seconds
+        self.calls += 1
+        trial = await self._admit(deadline)
+        try:
+            return await self._call(inputs, deadline)
+        finally:
+            # A cancelled trial records no outcome; without this the breaker would stay half-open forever
+            if trial:
+                self.breaker.release_trial()
+
+    async def _call(self, inputs: dict, deadline: float) -> str:
+        async with self._get_semaphore():
+            self.in_flight += 1
+            try:
+                attempt = 0
+                while True:
+                    start = time.monotonic()
+                    try:
+                        answer = await self._hedged_call(inputs, deadline)
+                    except Exception as e:
+                        if isinstance(e, asyncio.TimeoutError):
+                            self.timeouts += 1
+                        if _is_retryable(e) and attempt < self.max_retries and await self._backoff(attempt, deadline):
+                            attempt += 1
+                            continue
+                        self.failed += 1
+                        if _is_retryable(e):
+                            # Only upstream trouble counts: a malformed request must not open the breaker for everyone
+                            self.breaker.record_failure()
+                        if isinstance(e, asyncio.TimeoutError):
+                            raise LLMUnavailable("The answer service took too long to respond.") from e
+                        raise
+                    self._latencies.append(time.monotonic() - start)
+                    self.succeeded += 1
+                    self.breaker.record_success()
+                    return answer
+            finally:
+                self.in_flight -= 1
+
+    async def astream(self, inputs: dict, config=None) -> AsyncIterator[str]:
+        """
+        Streams tokens under the same limits. Failures before the first token
+        are retried; once tokens were sent the error is raised to the caller.
+        The deadline covers the whole stream.
+        """
+        deadline = time.monotonic() + self.timeout_seconds
+        self.calls += 1
+        trial = await self._admit(deadline)
+        try:
+            async with self._get_semaphore():
+                self.in_flight += 1
+                try:
+                    attempt = 0
+                    while True:
+                        start = time.monotonic()
+                        started = False
+                        stream = self.chain.astream(inputs).__aiter__()
+                        try:
+                            while True:
+                                remaining = deadline - time.monotonic()
+                                if remaining <= 0:
+                                    raise asyncio.TimeoutError()
+                                try:
+                                    token = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                                except StopAsyncIteration:
+                                    break
+                                if not started:
+                                    self._latencies.append(time.monotonic() - start)
+                                    started = True
+                                yield token
+                        except Exception as e:
+                            if isinstance(e, asyncio.TimeoutError):
+                                self.timeouts += 1
+                            if (
+                                not started and _is_retryable(e) and attempt < self.max_retries
+                                and await self._backoff(attempt, deadline)
+                            ):
+                                attempt += 1
+                                continue
+                            self.failed += 1
+                            if _is_retryable(e):
+                                self.breaker.record_failure()
+                            if isinstance(e, asyncio.TimeoutError):
+                                raise LLMUnavailable("The answer service took too long to respond.") from e
+                            raise
+                        finally:
+                            if hasattr(stream, "aclose"):
+                                await stream.aclose()
+                        self.succeeded += 1
+                        self.breaker.record_success()
+                        return
+                finally:
+                    self.in_flight -= 1
+        finally:
+            # Also runs when the consumer stops reading (GeneratorExit) or is cancelled
+            if trial:
+                self.breaker.release_trial()
+
+    def stats(self) -> dict:
+        latencies = np.array(self._latencies) if self._latencies else None
+        return {
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)) * 1000, 1) if latencies is not None else None,
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)) * 1000, 1) if latencies is not None else None,
+        }
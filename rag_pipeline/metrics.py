@@ -0,0 +1,160 @@
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import threading
+import resource
+import time
+import uuid
+import os
+
+# --- Metrics & Tracing Settings ---
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "false").lower() == "true"  # otherwise only when X-Trace-Id is sent
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2000"))
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "100"))
+
+# Seconds; spans sub-millisecond index lookups up to slow LLM calls and large uploads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """A labelled Prometheus histogram (cumulative buckets, sum and count)."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple((name, str(labels[name])) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """A gauge whose value is read from a callback when /metrics is scraped."""
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.read())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+UPLOAD_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_upload_stage_seconds", "Time per upload spent in each ingest stage.", ["stage"]
+))
+CHAT_STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_chat_stage_seconds", "Time per question spent in each chat stage.", ["stage"]
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rag_http_request_seconds", "Time to response headers per HTTP route.", ["method", "route", "status"]
+))
+
+
+def process_resident_bytes() -> float:
+    """Current RSS from /proc on Linux, else the peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY.register(Gauge("rag_process_resident_bytes", "Resident memory of this worker.", process_resident_bytes))
+
+
+def observe_stages(histogram: Histogram, timings: dict):
+    """Record every `<stage>_ms` entry of a timings dict into a stage histogram."""
+    for key, value in timings.items():
+        if key.endswith("_ms") and isinstance(value, (int, float)):
+            histogram.observe(value / 1000, stage=key[:-3])
+
+
+class Trace:
+    """Stage timings of one traced request, logged when it turns out slow."""
+
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.timings: dict = {}
+        self.total_ms: Optional[float] = None
+
+    def finish(self, timings: Optional[dict] = None):
+        if self.total_ms is not None:
+            return
+        self.total_ms = round((time.perf_counter() - self._start) * 1000, 2)
+        self.timings.update(timings or {})
+        if self.total_ms >= TRACE_SLOW_MS:
+            stages = {key: value for key, value in self.timings.items() if key.endswith("_ms") and key != "total_ms"}
+            slowest = max(stages, key=stages.get) if stages else "unknown"
+            print(f"🐢 Slow request {self.trace_id} {self.name}: {self.total_ms:.0f}ms, slowest stage {slowest} ({stages})")
+            slow_traces.append(self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": self.total_ms,
+            "timings": self.timings,
+        }
+
+
+slow_traces: deque = deque(maxlen=TRACE_HISTORY)
+
+
+def start_trace(name: str, trace_id: Optional[str] = None) -> Optional[Trace]:
+    """Start tracing this request if tracing is on or the client sent a trace id."""
+    if not (TRACE_REQUESTS or trace_id):
+        return None
+    return Trace(trace_id or uuid.uuid4().hex[:16], name)
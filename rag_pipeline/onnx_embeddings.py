@@ -0,0 +1,176 @@
+"""
+ONNX Runtime backend for the embedding model (EMBEDDING_BACKEND=onnx).
+
+Export and quantize the bundled model once, then point EMBEDDING_ONNX_PATH
+at the result:
+
+    python -m rag_pipeline.onnx_embeddings --output models/all-MiniLM-L6-v2-onnx
+
+This writes model.onnx (fp32) and model_int8.onnx (dynamic int8 weights),
+with the tokenizer, and exits with an error if either drifts below
+EMBEDDING_ONNX_MIN_COSINE cosine similarity to the torch vectors.
+"""
+from typing import List, Optional
+import numpy as np
+import argparse
+import shutil
+import json
+import os
+
+# --- ONNX Embedding Settings ---
+EMBEDDING_ONNX_PATH = os.getenv("EMBEDDING_ONNX_PATH", "models/all-MiniLM-L6-v2-onnx/model_int8.onnx")
+EMBEDDING_ONNX_MIN_COSINE = float(os.getenv("EMBEDDING_ONNX_MIN_COSINE", "0.98"))
+
+_DEFAULT_MAX_SEQ_LENGTH = 256
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+# Varied lengths and shapes (identifiers, numbers, prose) for the export-time parity check
+PARITY_TEXTS = [
+    "What is the torque for part P-4471?",
+    "hello",
+    "Error code E-1043 indicates a pressure sensor calibration fault.",
+    "The warranty does not cover damage caused by improper installation or use of non-original parts.",
+    "Replace the gasket every 500 operating hours or when a leak is detected, whichever comes first.",
+    "Section 4.2: Either party may terminate this agreement with ninety (90) days written notice.",
+    "firmware_update_v2.3.1 voltage 24V DC bracket M8x20",
+    "Inspection schedule: weekly visual check, monthly lubrication, annual full service by a certified technician. "
+    "Record every intervention in the maintenance log together with the operator name, date and meter reading, "
+    "and report anomalies to the supervisor before the machine is returned to service.",
+]
+
+
+class OnnxEmbeddingModel:
+    """
+    Drop-in for SentenceTransformer.encode over an exported MiniLM: runs the
+    transformer in ONNX Runtime, then mean-pools over the attention mask.
+    Texts are sorted by token length before batching so each batch is only
+    padded to its own longest text, then returned in input order.
+    """
+
+    def __init__(self, model_file: str = EMBEDDING_ONNX_PATH, num_threads: int = 0, sort_by_length: bool = True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = os.path.dirname(model_file)
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.max_seq_length = _DEFAULT_MAX_SEQ_LENGTH
+        config_path = os.path.join(model_dir, "sentence_bert_config.json")
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                self.max_seq_length = json.load(f).get("max_seq_length", _DEFAULT_MAX_SEQ_LENGTH)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        self.sort_by_length = sort_by_length
+
+        self.tokens = 0  # real tokens fed to the model
+        self.padded_tokens = 0  # tokens including padding
+
+    def encode(
+        self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = True, show_progress_bar: bool = False
+    ) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        lengths = np.array([len(encoding.ids) for encoding in encodings])
+        order = np.argsort(lengths, kind="stable") if self.sort_by_length else np.arange(len(texts))
+        vectors: Optional[np.ndarray] = None
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            width = int(lengths[batch].max())
+            arrays = {name: np.zeros((len(batch), width), dtype=np.int64) for name in _INPUT_NAMES}
+            for row, i in enumerate(batch):
+                encoding = encodings[i]
+                n = len(encoding.ids)
+                arrays["input_ids"][row, :n] = encoding.ids
+                arrays["attention_mask"][row, :n] = 1
+                arrays["token_type_ids"][row, :n] = encoding.type_ids
+            feeds = {name: array for name, array in arrays.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = arrays["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if vectors is None:
+                vectors = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            vectors[batch] = pooled
+            self.tokens += int(lengths[batch].sum())
+            self.padded_tokens += len(batch) * width
+        if vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def padding_ratio(self) -> Optional[float]:
+        """Share of the tokens run through the model that were padding."""
+        return round(1 - self.tokens / self.padded_tokens, 4) if self.padded_tokens else None
+
+
+def parity_check(model, texts: List[str], model_path: str) -> dict:
+    """Cosine similarity of `model`'s vectors against the torch sentence-transformers ones."""
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(model_path, device="cpu").encode(texts, normalize_embeddings=True)
+    candidate = model.encode(texts, normalize_embeddings=True)
+    cosines = (np.asarray(reference) * candidate).sum(axis=1)
+    return {"texts": len(texts), "min_cosine": round(float(cosines.min()), 5), "mean_cosine": round(float(cosines.mean()), 5)}
+
+
+def export_onnx(model_path: str, output_dir: str, quantize: bool = True) -> List[str]:
+    """Export the sentence-transformers model to ONNX (and int8); returns the written model files."""
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    model = SentenceTransformer(model_path, device="cpu")
+    transformer = model[0].auto_model.eval()
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    sample = model.tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in _INPUT_NAMES),
+            fp32_path,
+            input_names=list(_INPUT_NAMES),
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in (*_INPUT_NAMES, "last_hidden_state")},
+            opset_version=14,
+        )
+    for name in ("tokenizer.json", "sentence_bert_config.json"):
+        shutil.copy(os.path.join(model_path, name), os.path.join(output_dir, name))
+    written = [fp32_path]
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, "model_int8.onnx")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        written.append(int8_path)
+    return written
+
+
+def main():
+    from rag_pipeline.embeddings import EMBEDDING_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_PATH)
+    parser.add_argument("--output", default=os.path.dirname(EMBEDDING_ONNX_PATH))
+    parser.add_argument("--no-quantize", action="store_true", help="Only write the fp32 model")
+    parser.add_argument("--min-cosine", type=float, default=EMBEDDING_ONNX_MIN_COSINE)
+    args = parser.parse_args()
+
+    failed = False
+    for model_file in export_onnx(args.model, args.output, quantize=not args.no_quantize):
+        parity = parity_check(OnnxEmbeddingModel(model_file), PARITY_TEXTS, args.model)
+        ok = parity["min_cosine"] >= args.min_cosine
+        failed |= not ok
+        print(
+            f"{'✅' if ok else '❌'} {model_file}: cosine vs torch min {parity['min_cosine']:.5f}, "
+            f"mean {parity['mean_cosine']:.5f} (threshold {args.min_cosine})"
+        )
+    if failed:
+        raise SystemExit("ONNX embeddings drifted too far from the torch model; do not use this export.")
+
+
+if __name__ == "__main__":
+    main()
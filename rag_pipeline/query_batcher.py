@@ -0,0 +1,136 @@
+from fastapi.concurrency import run_in_threadpool
+from collections import deque
+from typing import List, Optional, Set, Tuple
+import numpy as np
+import asyncio
+import threading
+import time
+import os
+
+from rag_pipeline.embeddings import SharedEmbeddings, get_embeddings
+
+# --- Query Batching Settings ---
+QUERY_BATCH_ENABLED = os.getenv("QUERY_BATCH_ENABLED", "true").lower() == "true"
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "16"))
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+
+# Recent queue delays kept for the percentile metrics
+_DELAY_WINDOW = 1000
+
+
+class QueryEmbeddingBatcher:
+    """
+    Collects questions from concurrent requests and embeds them together.
+    The first question of a batch starts a `max_wait_ms` timer; the batch is
+    sent when the timer fires or `max_batch` questions are waiting, whichever
+    comes first, and each caller's future gets its own vector. While one
+    batch is in the model the next one fills up, so under load batches grow
+    on their own. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        embeddings: SharedEmbeddings,
+        max_batch: int = QUERY_BATCH_MAX_SIZE,
+        max_wait_ms: float = QUERY_BATCH_MAX_WAIT_MS,
+    ):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks: an unreferenced batch could be collected mid-flight
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batches = 0
+        self.questions = 0
+        self.max_batch_seen = 0
+        self.batch_sizes: dict = {}
+        self._delays_ms: deque = deque(maxlen=_DELAY_WINDOW)
+
+    async def embed(self, question: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((question, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self):
+        """Send the waiting questions and wait for every batch in flight (on shutdown)."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        sent_at = time.perf_counter()
+        self.batches += 1
+        self.questions += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+        self._delays_ms.extend((sent_at - queued_at) * 1000 for _, _, queued_at in batch)
+        try:
+            vectors = await run_in_threadpool(self.embeddings.embed_queries, [question for question, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        delays = np.array(self._delays_ms) if self._delays_ms else None
+        return {
+            "enabled": True,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "questions": self.questions,
+            "avg_batch_size": round(self.questions / self.batches, 2) if self.batches else None,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_counts": dict(sorted(self.batch_sizes.items())),
+            "queue_delay_ms_p50": round(float(np.percentile(delays, 50)), 3) if delays is not None else None,
+            "queue_delay_ms_p95": round(float(np.percentile(delays, 95)), 3) if delays is not None else None,
+        }
+
+
+_query_batcher: Optional[QueryEmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher() -> Optional[QueryEmbeddingBatcher]:
+    """The process-wide batcher over the shared model, or None when disabled."""
+    global _query_batcher
+    if not QUERY_BATCH_ENABLED:
+        return None
+    if _query_batcher is None:
+        with _batcher_lock:
+            if _query_batcher is None:
+                _query_batcher = QueryEmbeddingBatcher(get_embeddings())
+    return _query_batcher
+
+
+async def embed_question(question: str) -> List[float]:
+    """Embed a question off the event loop, batched with concurrent ones when enabled."""
+    batcher = get_query_batcher()
+    if batcher is None:
+        return await run_in_threadpool(get_embeddings().embed_query, question)
+    return await batcher.embed(question)
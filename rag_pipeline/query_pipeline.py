@@ -0,0 +1,192 @@
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable
+from fastapi.concurrency import run_in_threadpool
+from typing import AsyncIterator, Dict, List, Optional
+import threading
+import time
+
+from rag_pipeline.embeddings import get_embeddings
+from rag_pipeline.vectorstore import DocumentIndex
+from rag_pipeline.lexical_index import HYBRID_SEARCH
+from rag_pipeline.reranker import RERANK_CANDIDATES, RERANK_MAX_TOKENS, RERANK_TOP_N, fit_token_budget, get_reranker
+from rag_pipeline.context_packer import CONTEXT_PACKING, count_tokens, pack_context
+
+
+class PipelineStats:
+    """Cumulative per-stage timings and context size across all questions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.questions = 0
+        self.stage_ms: Dict[str, float] = {}
+        self.stage_counts: Dict[str, int] = {}
+        self.context_tokens = 0
+        self.context_tokens_unpacked = 0
+        self.rerank_fallbacks: Dict[str, int] = {}
+
+    def record(self, timings: dict, context: List[Document]):
+        rerank_fallback = timings.get("rerank_fallback")
+        context_tokens = timings.get("context_tokens")
+        if context_tokens is None:
+            context_tokens = sum(count_tokens(doc.page_content) for doc in context)
+        with self._lock:
+            self.questions += 1
+            self.context_tokens += context_tokens
+            self.context_tokens_unpacked += timings.get("context_tokens_unpacked", context_tokens)
+            for stage, ms in timings.items():
+                if stage.endswith("_ms"):
+                    self.stage_ms[stage] = self.stage_ms.get(stage, 0.0) + ms
+                    self.stage_counts[stage] = self.stage_counts.get(stage, 0) + 1
+            if rerank_fallback:
+                self.rerank_fallbacks[rerank_fallback] = self.rerank_fallbacks.get(rerank_fallback, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "questions": self.questions,
+                "avg_stage_ms": {
+                    stage: round(total / self.stage_counts[stage], 2) for stage, total in self.stage_ms.items()
+                },
+                "avg_context_tokens": round(self.context_tokens / self.questions, 1) if self.questions else None,
+                "avg_context_tokens_unpacked": (
+                    round(self.context_tokens_unpacked / self.questions, 1) if self.questions else None
+                ),
+                "rerank_fallbacks": dict(self.rerank_fallbacks),
+            }
+
+
+pipeline_stats = PipelineStats()
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class QueryPipeline:
+    """
+    Retrieval + answer generation for one document, built once and reused.
+    The page range, question and (optionally) the question embedding are
+    passed per call, so no retriever or chain objects are created per request.
+    With re-ranking enabled, retrieval over-fetches and a cross-encoder picks
+    the chunks that go into the prompt.
+    """
+
+    def __init__(self, document_index: DocumentIndex, document_chain: Runnable, k: int = 7):
+        self.document_index = document_index
+        self.document_chain = document_chain
+        self.k = k
+
+    def retrieve(
+        self,
+        question: str,
+        start_page: int,
+        end_page: int,
+        query_vector: Optional[List[float]] = None,
+        timings: Optional[dict] = None,
+    ) -> List[Document]:
+        """
+        Top chunks for the question from inside the page range (dense + BM25
+        unless disabled), re-ranked and packed into the token budget when
+        enabled. Stage durations in ms and context token counts are added to
+        `timings`.
+        """
+        timings = timings if timings is not None else {}
+        if query_vector is None:
+            start = time.perf_counter()
+            query_vector = get_embeddings().embed_query(question)
+            timings["embed_ms"] = _elapsed_ms(start)
+
+        reranker = get_reranker()
+        k = max(self.k, RERANK_CANDIDATES) if reranker else self.k
+        start = time.perf_counter()
+        if HYBRID_SEARCH:
+            hits = self.document_index.hybrid_search(question, query_vector, k, start_page, end_page, timings=timings)
+        else:
+            hits = self.document_index.similarity_search_by_vector(query_vector, k, start_page, end_page, timings)
+        documents = [doc for doc, _ in hits]
+        timings["retrieve_ms"] = _elapsed_ms(start)
+
+        if reranker:
+            start = time.perf_counter()
+            documents, fallback = reranker.rerank(question, documents)
+            documents = fit_token_budget(documents, RERANK_TOP_N, RERANK_MAX_TOKENS)
+            timings["rerank_ms"] = _elapsed_ms(start)
+            if fallback:
+                timings["rerank_fallback"] = fallback
+
+        if CONTEXT_PACKING:
+            start = time.perf_counter()
+            chunk_count = len(documents)
+            documents, tokens_before, tokens_after = pack_context(documents)
+            timings["pack_ms"] = _elapsed_ms(start)
+            timings["context_tokens_unpacked"], timings["context_tokens"] = tokens_before, tokens_after
+            print(f"📦 Packed context: {chunk_count} chunks, {tokens_before} -> {tokens_after} tokens in {len(documents)} blocks")
+        return documents
+
+    async def aretrieve(
+        self,
+        question: str,
+        start_page: int,
+        end_page: int,
+        query_vector: Optional[List[float]] = None,
+        timings: Optional[dict] = None,
+    ) -> List[Document]:
+        return await run_in_threadpool(self.retrieve, question, start_page, end_page, query_vector, timings)
+
+    async def ainvoke(
+        self,
+        question: str,
+        start_page: int,
+        end_page: int,
+        query_vector: Optional[List[float]] = None,
+        timings: Optional[dict] = None,
+    ) -> dict:
+        """
+        Same output shape as create_retrieval_chain ({'input', 'context', 'answer'})
+        plus 'timings', which extends the `timings` dict passed in, if any.
+        """
+        timings = timings if timings is not None else {}
+        context = await self.aretrieve(question, start_page, end_page, query_vector, timings)
+        start = time.perf_counter()
+        answer = await self.document_chain.ainvoke({"input": question, "context": context})
+        timings["generate_ms"] = _elapsed_ms(start)
+        pipeline_stats.record(timings, context)
+        return {"input": question, "context": context, "answer": answer, "timings": timings}
+
+    async def astream(
+        self,
+        question: str,
+        start_page: int,
+        end_page: int,
+        query_vector: Optional[List[float]] = None,
+        timings: Optional[dict] = None,
+    ) -> AsyncIterator[dict]:
+        """Yields {'context': docs} once, then {'answer': token} chunks, then {'timings': ...}."""
+        timings = timings if timings is not None else {}
+        context = await self.aretrieve(question, start_page, end_page, query_vector, timings)
+        yield {"context": context}
+        start = time.perf_counter()
+        first_token = True
+        tokens = self.document_chain.astream({"input": question, "context": context})
+        try:
+            async for token in tokens:
+                if first_token:
+                    timings["first_token_ms"] = _elapsed_ms(start)
+                    first_token = False
+                yield {"answer": token}
+        finally:
+            # Close the LLM stream (and free its gateway slot) as soon as the caller stops reading
+            if hasattr(tokens, "aclose"):
+                await tokens.aclose()
+        timings["generate_ms"] = _elapsed_ms(start)
+        pipeline_stats.record(timings, context)
+        yield {"timings": timings}
+
+
+def get_query_pipeline(document_index: DocumentIndex, document_chain: Runnable) -> QueryPipeline:
+    """The document's pipeline, created on first use and kept with its index."""
+    pipeline = document_index.query_pipeline
+    if pipeline is None or pipeline.document_chain is not document_chain:
+        pipeline = QueryPipeline(document_index, document_chain)
+        document_index.query_pipeline = pipeline
+    return pipeline
@@ -1,20 +1,37 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
+from typing import Optional
+import threading
 import os
 
+from rag_pipeline.llm_gateway import LLM_TIMEOUT_SECONDS, LLMGateway
+from rag_pipeline.fake_llm import FakeDocumentChain
+
+# gemini | fake (offline, see rag_pipeline/fake_llm.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+
 def create_rag_chain():
     """
     Creates the core part of the RAG chain (prompt + LLM)
     that generates an answer based on context.
     """
+    # Imported here: the Gemini client alone takes seconds to import, which would delay startup
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain.prompts import ChatPromptTemplate
+
     load_dotenv()
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY not found in .env file. Please check your .env file.")
     
-    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=api_key, temperature=0.2)
+    # Retries and deadlines are handled by the LLM gateway, so the client makes a single attempt
+    llm = ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        google_api_key=api_key,
+        temperature=0.2,
+        max_retries=1,
+        timeout=LLM_TIMEOUT_SECONDS,
+    )
     
     
     prompt = ChatPromptTemplate.from_template(
@@ -32,4 +49,25 @@ Answer:"""
     
     document_chain = create_stuff_documents_chain(llm, prompt)
     
-    return document_chain
\ No newline at end of file
+    return document_chain
+
+_document_chain: Optional[LLMGateway] = None
+_document_chain_lock = threading.Lock()
+
+def get_document_chain():
+    """
+    Return the process-wide document chain, building the LLM client only once.
+    Every call goes through the LLM gateway (concurrency cap, rate limit,
+    deadlines, retries, circuit breaker).
+    """
+    global _document_chain
+    if _document_chain is None:
+        with _document_chain_lock:
+            if _document_chain is None:
+                chain = FakeDocumentChain() if LLM_PROVIDER == "fake" else create_rag_chain()
+                _document_chain = LLMGateway(chain)
+    return _document_chain
+
+def peek_document_chain() -> Optional[LLMGateway]:
+    """The document chain if it has been built, without building it."""
+    return _document_chain
@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from langchain_core.documents import Document
+from typing import List, Optional, Tuple
+import threading
+import time
+import os
+
+from rag_pipeline.context_packer import count_tokens
+
+# --- Re-ranking Settings ---
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL_PATH = os.getenv("RERANK_MODEL_PATH", "models/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))  # chunks over-fetched for re-ranking
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "7"))
+RERANK_MAX_TOKENS = int(os.getenv("RERANK_MAX_TOKENS", "2000"))  # context budget for the kept chunks
+RERANK_TIMEOUT_MS = float(os.getenv("RERANK_TIMEOUT_MS", "300"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+
+
+def fit_token_budget(documents: List[Document], top_n: int, max_tokens: int) -> List[Document]:
+    """The first `top_n` documents that fit in `max_tokens`, keeping at least one."""
+    kept, used = [], 0
+    for doc in documents:
+        if len(kept) >= top_n:
+            break
+        tokens = count_tokens(doc.page_content)
+        if kept and used + tokens > max_tokens:
+            continue
+        kept.append(doc)
+        used += tokens
+    return kept
+
+
+class CrossEncoderReranker:
+    """
+    Scores (question, chunk) pairs with a small local cross-encoder in one
+    batched CPU pass. Scoring runs on a single background thread; if waiting
+    for it (including any earlier request still being scored) takes longer
+    than `timeout_ms`, the caller gets the dense order back instead.
+    """
+
+    def __init__(
+        self,
+        model_path: str = RERANK_MODEL_PATH,
+        batch_size: int = RERANK_BATCH_SIZE,
+        timeout_ms: float = RERANK_TIMEOUT_MS,
+    ):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.timeout_ms = timeout_ms
+        self._model = None
+        self._load_failed = False
+        self._load_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._busy = threading.Semaphore(1)
+
+        self.reranked = 0
+        self.scored = 0  # includes passes that finished after their caller timed out
+        self.timeouts = 0
+        self.skipped_busy = 0
+        self.errors = 0
+        self.rerank_seconds = 0.0
+
+    def load(self):
+        """Load the cross-encoder once; a missing model disables re-ranking."""
+        if self._model is not None or self._load_failed:
+            return self._model
+        with self._load_lock:
+            if self._model is None and not self._load_failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+
+                    start = time.perf_counter()
+                    self._model = CrossEncoder(self.model_path, device="cpu", max_length=512)
+                    print(f"✅ Re-ranking model loaded from '{self.model_path}' in {time.perf_counter() - start:.2f}s")
+                except Exception as e:
+                    self._load_failed = True
+                    print(f"⚠️ Re-ranking disabled, could not load '{self.model_path}': {e}")
+        return self._model
+
+    def _score(self, question: str, documents: List[Document]) -> List[float]:
+        try:
+            start = time.perf_counter()
+            scores = self._model.predict(
+                [(question, doc.page_content) for doc in documents],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            self.rerank_seconds += time.perf_counter() - start
+            self.scored += 1
+            return scores.tolist()
+        finally:
+            self._busy.release()
+
+    def rerank(self, question: str, documents: List[Document]) -> Tuple[List[Document], Optional[str]]:
+        """
+        Documents ordered by cross-encoder score, or in their original order
+        with the reason ("unavailable", "busy", "timeout", "error") when scoring
+        was skipped or failed.
+        """
+        if not documents:
+            return documents, None
+        if self.load() is None:
+            return documents, "unavailable"
+        deadline = time.monotonic() + self.timeout_ms / 1000
+        if not self._busy.acquire(timeout=self.timeout_ms / 1000):
+            self.skipped_busy += 1
+            return documents, "busy"
+        try:
+            future = self._executor.submit(self._score, question, documents)
+        except Exception as e:
+            self._busy.release()
+            return self._scoring_failed(documents, e)
+        try:
+            scores = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            # Scoring finishes in the background and releases the slot itself
+            self.timeouts += 1
+            return documents, "timeout"
+        except Exception as e:
+            # A broken model file, OOM or tokenizer error: answer from the dense order
+            return self._scoring_failed(documents, e)
+        self.reranked += 1
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])
+        return [documents[i] for i in order], None
+
+    def _scoring_failed(self, documents: List[Document], error: Exception) -> Tuple[List[Document], str]:
+        self.errors += 1
+        print(f"⚠️ Re-ranking failed, keeping the retrieval order: {error}")
+        return documents, "error"
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RERANK_ENABLED,
+            "model_path": self.model_path,
+            "loaded": self._model is not None,
+            "reranked": self.reranked,
+            "timeouts": self.timeouts,
+            "skipped_busy": self.skipped_busy,
+            "errors": self.errors,
+            "avg_rerank_ms": round(self.rerank_seconds * 1000 / self.scored, 2) if self.scored else None,
+        }
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """The process-wide re-ranker, or None when RERANK_ENABLED is off."""
+    global _reranker
+    if not RERANK_ENABLED:
+        return None
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
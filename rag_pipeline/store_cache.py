@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import threading
+import time
+import faiss
+import os
+
+from rag_pipeline.vectorstore import DocumentIndex
+from rag_pipeline.chunk_store import ChunkStore
+
+# --- Cache Settings ---
+STORE_CACHE_MAX_BYTES = int(os.getenv("STORE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1 GiB
+STORE_CACHE_IDLE_TTL = float(os.getenv("STORE_CACHE_IDLE_TTL", "3600"))  # seconds, 0 = never
+
+# Rough per-chunk cost of the Document object, metadata dict and docstore ids
+CHUNK_OVERHEAD_BYTES = 600
+
+
+def estimate_index_bytes(index) -> int:
+    """
+    Approximate resident size of a FAISS index from its vector count, code
+    size and list count, without serializing it.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        hnsw = index.hnsw
+        graph_bytes = hnsw.neighbors.size() * 4 + hnsw.levels.size() * 4 + hnsw.offsets.size() * 8
+        return graph_bytes + estimate_index_bytes(faiss.downcast_index(index.storage))
+    if isinstance(index, faiss.IndexIVF):
+        # Each list entry holds the code and an int64 id; the coarse quantizer holds nlist centroids
+        size = index.ntotal * (index.code_size + 8) + index.nlist * index.d * 4
+        if index.direct_map.type != faiss.DirectMap.NoMap:
+            size += index.ntotal * 8
+        if isinstance(index, faiss.IndexIVFPQ):
+            size += (index.pq.centroids.size() + index.precomputed_table.size()) * 4
+        return size
+    if isinstance(index, faiss.IndexFlat):
+        return index.ntotal * index.d * 4
+    return index.ntotal * getattr(index, "code_size", index.d * 4)
+
+
+def estimate_document_bytes(document_index: DocumentIndex) -> int:
+    """Approximate resident size of a document: vectors, BM25 postings, chunk text and bookkeeping."""
+    store = document_index.vector_store
+    with document_index.lock:
+        index_bytes = estimate_index_bytes(store.index) + document_index.lexical_index.nbytes()
+        if isinstance(store.docstore, ChunkStore):
+            text_bytes = store.docstore.nbytes()
+        else:
+            text_bytes = document_index.text_bytes + store.index.ntotal * CHUNK_OVERHEAD_BYTES
+    return index_bytes + text_bytes
+
+
+class _Entry:
+    __slots__ = ("value", "size", "last_access")
+
+    def __init__(self, value: DocumentIndex, size: int):
+        self.value = value
+        self.size = size
+        self.last_access = time.monotonic()
+
+
+class VectorStoreCache:
+    """
+    Keeps loaded document indexes in memory under a byte budget.
+    Least recently used entries are evicted first, and entries idle for
+    longer than `idle_ttl` are dropped on the next access. Misses go to
+    `loader`. Every finished index is already in the index store before it
+    is cached, so evicted entries are simply dropped.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[str], Optional[DocumentIndex]]] = None,
+        max_bytes: int = STORE_CACHE_MAX_BYTES,
+        idle_ttl: float = STORE_CACHE_IDLE_TTL,
+    ):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.resident_bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[DocumentIndex]:
+        """Return a cached index, loading it through `loader` on a miss."""
+        with self._lock:
+            self._expire_idle()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                entry.last_access = time.monotonic()
+                self._entries.move_to_end(key)
+                return entry.value
+            self.misses += 1
+            if self.loader is None:
+                return None
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the cache lock so other documents stay available
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return entry.value
+            value = self.loader(key)
+            if value is not None:
+                self.put(key, value)
+        with self._lock:
+            self._load_locks.pop(key, None)
+        return value
+
+    def put(self, key: str, value: DocumentIndex):
+        """Insert or replace an entry and evict down to the byte budget."""
+        size = estimate_document_bytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.resident_bytes -= old.size
+            self._entries[key] = _Entry(value, size)
+            self.resident_bytes += size
+            self._evict_to_budget(keep=key)
+
+    def peek(self, key: str) -> Optional[DocumentIndex]:
+        """The cached index, if any, without loading it or counting a lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def resize(self, key: str):
+        """Re-measure an entry whose index grew in place."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            size = estimate_document_bytes(entry.value)
+            self.resident_bytes += size - entry.size
+            entry.size = size
+            self._evict_to_budget(keep=key)
+
+    def pop(self, key: str, value: Optional[DocumentIndex] = None) -> Optional[DocumentIndex]:
+        """Drop an entry; if `value` is given, only while the entry still holds that index."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (value is not None and entry.value is not value):
+                return None
+            del self._entries[key]
+            self.resident_bytes -= entry.size
+            return entry.value
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key)
+        self.resident_bytes -= entry.size
+
+    def _evict_to_budget(self, keep: Optional[str] = None):
+        # An entry larger than the whole budget is still kept on its own
+        while self.resident_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                self._entries.move_to_end(oldest)
+                oldest = next(iter(self._entries))
+            self._evict(oldest)
+            self.evictions += 1
+
+    def _expire_idle(self):
+        if self.idle_ttl <= 0:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        # Entries are in access order, so idle ones are at the front
+        while self._entries:
+            oldest, entry = next(iter(self._entries.items()))
+            if entry.last_access > cutoff:
+                break
+            self._evict(oldest)
+            self.expirations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire_idle()
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
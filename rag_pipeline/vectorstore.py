@@ -1,13 +1,307 @@
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from typing import List
-
-def create_vector_store(documents: List) -> FAISS:
-    """Create FAISS vector store from documents using locally stored embeddings."""
-    
-    # Use locally downloaded model path
-    embeddings = HuggingFaceEmbeddings(model_name="models/all-MiniLM-L6-v2")
-    
-    # Create FAISS vector store
-    vector_store = FAISS.from_documents(documents, embeddings)
-    return vector_store
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import threading
+import faiss
+import time
+import os
+
+from rag_pipeline.embeddings import get_embeddings
+from rag_pipeline.index_factory import INDEX_TYPE, build_faiss_index, choose_index_type, index_type_name
+from rag_pipeline.lexical_index import HYBRID_CANDIDATES, LexicalIndex, reciprocal_rank_fusion
+
+# Page ranges covering at most this many vectors are scored exactly against just
+# their own vectors; larger ranges use a FAISS ID-selector search instead.
+SUBSET_SCAN_MAX_VECTORS = int(os.getenv("SUBSET_SCAN_MAX_VECTORS", "20000"))
+# Chunks embedded and added to the index per step while a PDF streams in
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "128"))
+
+
+def _search_parameters(index, selector, selectivity: float = 1.0, k: int = 1):
+    """
+    Build the SearchParameters subclass matching the index type. The index's
+    own nprobe / efSearch are carried over (the parameter objects default to
+    much lower values) and scaled up the more selective the page filter is:
+    IVF probes more lists, so in-range hits are not lost in unprobed lists,
+    and HNSW widens its beam, which filtered-out nodes would otherwise fill.
+    """
+    scale = 1 / max(selectivity, 1e-6)
+    if isinstance(index, faiss.IndexIVF):
+        nprobe = min(index.nlist, int(np.ceil(index.nprobe * scale)))
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        ef_search = max(k, min(index.ntotal, int(np.ceil(index.hnsw.efSearch * scale))))
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _add_ms(timings: Optional[dict], key: str, start: float):
+    if timings is not None:
+        timings[key] = round(timings.get(key, 0.0) + (time.perf_counter() - start) * 1000, 2)
+
+
+class DocumentIndex:
+    """
+    One uploaded document: its FAISS store plus a page -> vector id map,
+    so a page-range question only searches the vectors inside that range,
+    and a BM25 index over the same vector ids for hybrid retrieval.
+    """
+
+    def __init__(
+        self,
+        vector_store: FAISS,
+        content_hash: Optional[str] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+        pages: Optional[np.ndarray] = None,
+    ):
+        """`pages` (page per vector id) saves reading every chunk when a stored index is opened."""
+        self.vector_store = vector_store
+        self.content_hash = content_hash
+        self.query_pipeline = None  # built lazily by rag_pipeline.query_pipeline
+        self.complete = True  # False while chunks are still being added
+        self.page_to_ids: Dict[int, List[int]] = {}
+        self.page_hashes: Optional[List[str]] = None  # text hash per page, for incremental re-indexing
+        self.text_bytes = 0  # UTF-8 size of the chunk text held in memory, kept up to date as chunks are added
+        self.lock = threading.RLock()
+        self._routing_centroids: Optional[Tuple[int, np.ndarray]] = None
+        if pages is not None and lexical_index is not None:
+            for vector_id, page in enumerate(pages.tolist()):
+                self.page_to_ids.setdefault(page, []).append(vector_id)
+        else:
+            documents = self._register_vectors(0)
+        if lexical_index is None:
+            # Stored before lexical indexes existed, or built in one go: index the docstore
+            lexical_index = LexicalIndex()
+            lexical_index.add(documents, 0)
+            lexical_index.freeze()
+        self.lexical_index = lexical_index
+
+    @property
+    def num_vectors(self) -> int:
+        return self.vector_store.index.ntotal
+
+    @property
+    def index_type(self) -> str:
+        return index_type_name(self.vector_store.index)
+
+    def compact(self, index_type: str = INDEX_TYPE) -> str:
+        """
+        Rebuild the (flat) index as the configured type once all chunks are in.
+        Vector ids stay the same, so the docstore and page map are untouched.
+        Returns the resulting index type.
+        """
+        with self.lock:
+            index = self.vector_store.index
+            self.lexical_index.freeze()
+            target = choose_index_type(index.ntotal, index_type)
+            if target == self.index_type or index.ntotal == 0:
+                return self.index_type
+            vectors = index.reconstruct_n(0, index.ntotal)
+            self.vector_store.index = build_faiss_index(vectors, target)
+            return self.index_type
+
+    def routing_centroids(self, num_centroids: int = 8) -> Optional[np.ndarray]:
+        """
+        A few k-means centroids summarising the document's vectors, used to
+        route collection queries to the documents worth searching. Computed on
+        first use and again after new vectors are added. None if the index
+        type cannot reconstruct its vectors.
+        """
+        with self.lock:
+            index = self.vector_store.index
+            if self._routing_centroids is not None and self._routing_centroids[0] == index.ntotal:
+                return self._routing_centroids[1]
+            if index.ntotal == 0:
+                return None
+            # FAISS k-means samples at most 256 points per centroid anyway
+            sample_size = min(index.ntotal, 256 * num_centroids)
+            sample = np.linspace(0, index.ntotal - 1, sample_size).astype(np.int64)
+            try:
+                vectors = index.reconstruct_batch(sample)
+            except RuntimeError:
+                return None
+            if len(vectors) <= num_centroids:
+                centroids = vectors
+            else:
+                kmeans = faiss.Kmeans(vectors.shape[1], num_centroids, niter=10, seed=1234, min_points_per_centroid=1)
+                kmeans.train(vectors)
+                centroids = kmeans.centroids
+            self._routing_centroids = (index.ntotal, centroids)
+            return centroids
+
+    def _register_vectors(self, first_id: int) -> List[Document]:
+        """Add vectors from `first_id` onwards to the page map; returns their chunks."""
+        store = self.vector_store
+        documents = []
+        for vector_id in range(first_id, store.index.ntotal):
+            doc = store.docstore.search(store.index_to_docstore_id[vector_id])
+            page = doc.metadata.get("page", -1)
+            self.page_to_ids.setdefault(page, []).append(vector_id)
+            self.text_bytes += len(doc.page_content.encode("utf-8"))
+            documents.append(doc)
+        return documents
+
+    def add_embeddings(self, documents: List[Document], vectors: List[List[float]]):
+        """Append already-embedded chunks; they are searchable as soon as this returns."""
+        with self.lock:
+            first_id = self.vector_store.index.ntotal
+            self.vector_store.add_embeddings(
+                zip([doc.page_content for doc in documents], vectors),
+                metadatas=[doc.metadata for doc in documents],
+            )
+            self.lexical_index.add(self._register_vectors(first_id), first_id)
+
+    def ids_in_range(self, start_page: int, end_page: int) -> np.ndarray:
+        """Vector ids for pages start_page..end_page (0-based, inclusive)."""
+        if end_page - start_page + 1 <= len(self.page_to_ids):
+            pages = (p for p in range(start_page, end_page + 1) if p in self.page_to_ids)
+        else:
+            pages = (p for p in self.page_to_ids if start_page <= p <= end_page)
+        ids = [vector_id for page in pages for vector_id in self.page_to_ids[page]]
+        return np.array(ids, dtype=np.int64)
+
+    def _subset_search(self, query: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact search over just `ids`; cost grows with the range, not the document."""
+        index = self.vector_store.index
+        vectors = index.reconstruct_batch(ids)
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            scores = -(vectors @ query[0])
+        else:
+            scores = ((vectors - query[0]) ** 2).sum(axis=1)
+        k = min(k, len(ids))
+        top = np.argpartition(scores, k - 1)[:k]
+        top = top[np.argsort(scores[top])]
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            return -scores[top], ids[top]
+        return scores[top], ids[top]
+
+    def _dense_search(self, query_vector: List[float], ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """FAISS scores and vector ids of the top-k among `ids` (call with the lock held)."""
+        store = self.vector_store
+        query = np.array([query_vector], dtype=np.float32)
+        if store._normalize_L2:
+            faiss.normalize_L2(query)
+        if len(ids) == store.index.ntotal:
+            scores, found = store.index.search(query, min(k, len(ids)))
+            scores, found = scores[0], found[0]
+        elif len(ids) <= SUBSET_SCAN_MAX_VECTORS:
+            try:
+                scores, found = self._subset_search(query, ids, k)
+            except RuntimeError:
+                # Index type without reconstruct support: fall back to an ID selector
+                scores, found = self._selector_search(query, ids, k)
+        else:
+            scores, found = self._selector_search(query, ids, k)
+        keep = found != -1
+        return scores[keep], found[keep]
+
+    def _document(self, vector_id: int) -> Document:
+        store = self.vector_store
+        return store.docstore.search(store.index_to_docstore_id[int(vector_id)])
+
+    def _ids_in_range_timed(self, start_page: int, end_page: int, timings: Optional[dict]) -> np.ndarray:
+        start = time.perf_counter()
+        ids = self.ids_in_range(start_page, end_page)
+        _add_ms(timings, "filter_ms", start)
+        return ids
+
+    def similarity_search_by_vector(
+        self, query_vector: List[float], k: int, start_page: int, end_page: int, timings: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top-k chunks restricted to the page range, with their FAISS scores."""
+        with self.lock:
+            ids = self._ids_in_range_timed(start_page, end_page, timings)
+            if len(ids) == 0:
+                return []
+            scores, found = self._dense_search(query_vector, ids, k)
+            return [(self._document(vector_id), float(score)) for score, vector_id in zip(scores, found)]
+
+    def hybrid_search(
+        self, query: str, query_vector: List[float], k: int, start_page: int, end_page: int,
+        candidates: int = HYBRID_CANDIDATES,
+        timings: Optional[dict] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Top-k chunks in the page range from dense and BM25 hits fused with
+        reciprocal rank fusion, so exact identifiers (part numbers, error
+        codes) are found even when their embedding is not close. Scores are
+        fusion scores: higher is better. Page filtering time goes to `timings`.
+        """
+        with self.lock:
+            ids = self._ids_in_range_timed(start_page, end_page, timings)
+            if len(ids) == 0:
+                return []
+            # Restricting BM25 to the range only pays off when the range is narrow
+            lexical_ids = ids if len(ids) < self.num_vectors else None
+            _, dense = self._dense_search(query_vector, ids, max(k, candidates))
+            _, lexical = self.lexical_index.search(query, max(k, candidates), lexical_ids)
+            fused = reciprocal_rank_fusion(dense.tolist(), lexical.tolist(), k)
+            return [(self._document(vector_id), score) for vector_id, score in fused]
+
+    def _selector_search(self, query: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        index = self.vector_store.index
+        k = min(k, len(ids))
+        params = _search_parameters(index, faiss.IDSelectorBatch(ids), len(ids) / index.ntotal, k)
+        scores, found = index.search(query, k, params=params)
+        return scores[0], found[0]
+
+
+def empty_document_index(dimension: int) -> DocumentIndex:
+    """A document index with no vectors yet, ready for `add_embeddings`."""
+    vector_store = FAISS(
+        embedding_function=get_embeddings(),
+        index=faiss.IndexFlatL2(dimension),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    return DocumentIndex(vector_store)
+
+
+def build_document_index(
+    chunks: Iterable[Document],
+    batch_size: int = INDEX_BATCH_SIZE,
+    on_batch: Optional[Callable[[DocumentIndex, List[Document]], None]] = None,
+    embedder=None,
+    timings: Optional[dict] = None,
+) -> Optional[DocumentIndex]:
+    """
+    Embed and index chunks as they arrive from a (lazy) iterable, one
+    fixed-size batch at a time, so memory stays bounded by the batch size and
+    early chunks are searchable before the last ones are produced. `on_batch`
+    is called after every batch with the index and the chunks just added.
+    `embedder` (anything with `embed_documents`) defaults to the shared model.
+    Time spent embedding and indexing is added to `timings` (embed_ms, index_ms).
+    Returns None if there were no chunks.
+    """
+    embeddings = embedder or get_embeddings()
+    document_index: Optional[DocumentIndex] = None
+    batch: List[Document] = []
+
+    def flush():
+        nonlocal document_index
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents([doc.page_content for doc in batch])
+        _add_ms(timings, "embed_ms", start)
+        start = time.perf_counter()
+        if document_index is None:
+            document_index = empty_document_index(len(vectors[0]))
+            document_index.complete = False
+        document_index.add_embeddings(batch, vectors)
+        _add_ms(timings, "index_ms", start)
+        if on_batch:
+            on_batch(document_index, batch)
+
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+
+    if document_index is not None:
+        document_index.complete = True
+    return document_index
+
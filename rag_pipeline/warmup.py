@@ -0,0 +1,55 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+import time
+import os
+
+# --- Warm-up Settings ---
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"  # else load on first use
+
+
+class Warmup:
+    """
+    Loads slow components (LLM client, models, heavy imports) one after the
+    other on a background thread, so the server accepts requests right away.
+    Each component is also loaded on first use if a request needs it before
+    the warm-up reaches it; `status()` backs the readiness probe.
+    """
+
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], object], bool]] = []
+        self.components: Dict[str, dict] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, load: Callable[[], object], required: bool = True):
+        """`required` components must be warm before the service reports ready."""
+        self._steps.append((name, load, required))
+        self.components[name] = {"status": "pending", "required": required, "seconds": None, "error": None}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        for name, load, _ in self._steps:
+            component = self.components[name]
+            component["status"] = "warming"
+            start = time.perf_counter()
+            try:
+                load()
+            except Exception as e:
+                component["status"] = "failed"
+                component["error"] = str(e)
+                print(f"❌ Warm-up of {name} failed: {e}")
+            else:
+                component["status"] = "ready"
+            component["seconds"] = round(time.perf_counter() - start, 3)
+            if component["status"] == "ready":
+                print(f"🔥 Warmed up {name} in {component['seconds']:.2f}s")
+
+    def status(self) -> dict:
+        if self._thread is None:
+            # Warm-up disabled (or not started yet): everything loads on first use
+            return {"ready": True, "warmup": "disabled", "components": self.components}
+        ready = all(c["status"] == "ready" for c in self.components.values() if c["required"])
+        return {"ready": ready, "warmup": "running" if self._thread.is_alive() else "done", "components": self.components}
@@ -0,0 +1,27 @@
+from rag_pipeline.embedding_cache import EmbeddingCache
+
+
+def vector(value, dim=8):
+    return [float(value)] * dim
+
+
+def test_reader_sees_meta_written_by_another_worker(tmp_path):
+    reader = EmbeddingCache(str(tmp_path), "model")
+    writer = EmbeddingCache(str(tmp_path), "model")
+    assert reader.get_many(["a"]) == [None]
+
+    writer.put_many(["a", "b"], [vector(1), vector(2)])
+    assert [found[0] for found in reader.get_many(["a", "b"])] == [1.0, 2.0]
+
+
+def test_append_after_torn_write_keeps_rows_aligned(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model")
+    cache.put_many(["a", "b"], [vector(1), vector(2)])
+    # A crash mid-append: one unrecorded row and part of another
+    row_bytes = cache.dim * cache.dtype.itemsize
+    with open(cache._vectors_path, "ab") as f:
+        f.write(b"\x01" * (row_bytes + 5))
+
+    cache.put_many(["c", "d"], [vector(3), vector(4)])
+    reopened = EmbeddingCache(str(tmp_path), "model")
+    assert [found[0] for found in reopened.get_many(["a", "b", "c", "d"])] == [1.0, 2.0, 3.0, 4.0]
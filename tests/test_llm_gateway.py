@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import pytest
+
+from rag_pipeline.fake_llm import FakeDocumentChain, FakeLLMError
+from rag_pipeline.llm_gateway import CircuitBreaker, LLMGateway, LLMUnavailable
+
+
+class ScriptedChain:
+    """Answers (or raises) from a script, one entry per call, after an optional delay."""
+
+    def __init__(self, *script, delays=None):
+        self.script = list(script)
+        self.delays = list(delays or [])
+        self.calls = 0
+
+    async def _next(self):
+        delay = self.delays[self.calls] if self.calls < len(self.delays) else 0
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if isinstance(step, BaseException):
+            raise step
+        return step
+
+    async def ainvoke(self, inputs, config=None):
+        return await self._next()
+
+    async def astream(self, inputs, config=None):
+        answer = await self._next()
+        for word in answer.split(" "):
+            yield word
+            await asyncio.sleep(0.01)
+
+
+def make_gateway(chain, **kwargs):
+    settings = dict(rate_per_second=0, timeout_seconds=2, max_retries=2, retry_base_delay=0.01, hedge=False)
+    settings.update(kwargs)
+    gateway = LLMGateway(chain, **settings)
+    gateway.breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    return gateway
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_breaker_opens_rejects_and_closes_after_trial():
+    chain = ScriptedChain(FakeLLMError("503"), FakeLLMError("503"), "ok")
+    gateway = make_gateway(chain, max_retries=0)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(FakeLLMError):
+                await gateway.ainvoke({})
+        assert gateway.breaker.state == "open"
+        with pytest.raises(LLMUnavailable):
+            await gateway.ainvoke({})
+        await asyncio.sleep(0.06)
+        assert gateway.breaker.state == "half_open"
+        assert await gateway.ainvoke({}) == "ok"
+
+    run(scenario())
+    assert gateway.breaker.state == "closed"
+    assert gateway.rejected == 1
+    assert chain.calls == 3
+
+
+def test_client_errors_leave_the_breaker_closed():
+    chain = ScriptedChain(ValueError("bad request"), ValueError("bad request"), ValueError("bad request"), "ok")
+    gateway = make_gateway(chain)
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                await gateway.ainvoke({})
+        assert gateway.breaker.state == "closed"
+        return await gateway.ainvoke({})
+
+    assert run(scenario()) == "ok"
+    assert gateway.rejected == 0
+
+
+def test_cancelled_trial_releases_half_open_slot():
+    chain = ScriptedChain(FakeLLMError("503"), FakeLLMError("503"), "slow", "ok", delays=[0, 0, 1, 0])
+    gateway = make_gateway(chain, max_retries=0)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(FakeLLMError):
+                await gateway.ainvoke({})
+        await asyncio.sleep(0.06)
+        trial = asyncio.ensure_future(gateway.ainvoke({}))
+        await asyncio.sleep(0.02)
+        assert gateway.breaker.trial_in_flight
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        assert not gateway.breaker.trial_in_flight
+        return await gateway.ainvoke({})
+
+    assert run(scenario()) == "ok"
+    assert gateway.breaker.state == "closed"
+
+
+def test_abandoned_stream_trial_releases_slot_and_semaphore():
+    chain = ScriptedChain(FakeLLMError("503"), FakeLLMError("503"), "one two three four", "ok")
+    gateway = make_gateway(chain, max_retries=0)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(FakeLLMError):
+                await gateway.ainvoke({})
+        await asyncio.sleep(0.06)
+        stream = gateway.astream({})
+        assert await stream.__anext__() == "one"
+        # The consumer stops reading, e.g. after a "not found" answer or a disconnect
+        await stream.aclose()
+        assert not gateway.breaker.trial_in_flight
+        assert gateway.in_flight == 0
+        return await gateway.ainvoke({})
+
+    assert run(scenario()) == "ok"
+
+
+def test_retryable_errors_are_retried():
+    chain = ScriptedChain(FakeLLMError("503"), FakeLLMError("503"), "ok")
+    gateway = make_gateway(chain)
+    assert run(gateway.ainvoke({})) == "ok"
+    assert gateway.retries == 2
+    assert gateway.succeeded == 1 and gateway.failed == 0
+
+
+def test_non_retryable_errors_fail_at_once():
+    chain = ScriptedChain(ValueError("bad request"), "ok")
+    gateway = make_gateway(chain)
+    with pytest.raises(ValueError):
+        run(gateway.ainvoke({}))
+    assert gateway.retries == 0
+    assert chain.calls == 1
+
+
+def test_stream_retries_only_before_the_first_token():
+    chain = ScriptedChain(FakeLLMError("503"), "hello world")
+    gateway = make_gateway(chain)
+
+    async def collect():
+        return [token async for token in gateway.astream({})]
+
+    assert run(collect()) == ["hello", "world"]
+    assert gateway.retries == 1
+
+
+def test_deadline_covers_the_whole_call():
+    chain = FakeDocumentChain(latency_ms=500, jitter_ms=0)
+    gateway = make_gateway(chain, timeout_seconds=0.1, max_retries=0)
+    start = time.monotonic()
+    with pytest.raises(LLMUnavailable):
+        run(gateway.ainvoke({}))
+    assert time.monotonic() - start < 0.4
+    assert gateway.timeouts == 1
+    assert gateway.failed == 1
+
+
+def test_hedged_request_wins_when_primary_is_slow():
+    chain = ScriptedChain("slow primary", "fast hedge", delays=[1, 0])
+    gateway = make_gateway(chain, hedge=True)
+    gateway._latencies.extend([0.01] * 50)
+    start = time.monotonic()
+    assert run(gateway.ainvoke({})) == "fast hedge"
+    assert time.monotonic() - start < 0.5
+    assert gateway.hedges == 1 and gateway.hedge_wins == 1
@@ -0,0 +1,46 @@
+import numpy as np
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from rag_pipeline import vectorstore
+from rag_pipeline.index_factory import build_faiss_index
+from rag_pipeline.embeddings import get_embeddings
+from rag_pipeline.vectorstore import DocumentIndex
+
+
+def make_document_index(index_type, num_vectors=4000, pages=40, dimension=64, seed=0):
+    """A document of random clustered vectors, `num_vectors / pages` chunks per page."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(32, dimension))
+    vectors = (centers[rng.integers(0, 32, num_vectors)] + 0.3 * rng.normal(size=(num_vectors, dimension)))
+    vectors = vectors.astype(np.float32)
+    per_page = num_vectors // pages
+    documents = {
+        str(i): Document(page_content=f"chunk {i}", metadata={"page": i // per_page}) for i in range(num_vectors)
+    }
+    vector_store = FAISS(
+        embedding_function=get_embeddings(),
+        index=build_faiss_index(vectors, index_type),
+        docstore=InMemoryDocstore(documents),
+        index_to_docstore_id={i: str(i) for i in range(num_vectors)},
+    )
+    return DocumentIndex(vector_store), vectors, rng
+
+
+def test_filtered_hnsw_search_matches_exact_subset_scan(monkeypatch):
+    document_index, vectors, rng = make_document_index("hnsw")
+    assert document_index.index_type == "hnsw"
+    for _ in range(20):
+        query = vectors[rng.integers(0, len(vectors))] + 0.1 * rng.normal(size=vectors.shape[1]).astype(np.float32)
+        start_page = int(rng.integers(0, 39))
+        ids = document_index.ids_in_range(start_page, start_page)
+
+        monkeypatch.setattr(vectorstore, "SUBSET_SCAN_MAX_VECTORS", len(ids))
+        _, exact = document_index._dense_search(query.tolist(), ids, 7)
+        monkeypatch.setattr(vectorstore, "SUBSET_SCAN_MAX_VECTORS", 0)
+        _, filtered = document_index._dense_search(query.tolist(), ids, 7)
+
+        assert len(exact) == 7
+        assert filtered.tolist() == exact.tolist()
@@ -1,37 +1,137 @@
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List
+from langchain_core.documents import Document
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from typing import Callable, Iterator, List, Optional, Union
 from io import BytesIO
+import multiprocessing
+import threading
+import hashlib
+import time
 import os
 
-def load_and_split_pdf(file: BytesIO, filename: str) -> List:
-    """
-    Loads an entire PDF and splits it into chunks.
-    PyPDFLoader automatically adds 'page' metadata to each document chunk.
-    """
-    # Create a temporary directory to store the file for processing
-    os.makedirs("temp_data", exist_ok=True)
-    temp_path = os.path.join("temp_data", filename)
-    
-    with open(temp_path, "wb") as f:
-        f.write(file.getvalue())
-
-    # Load the PDF. Each page becomes a Document with metadata {'source': ..., 'page': N}
-    loader = PyPDFLoader(temp_path)
-    documents = loader.load()
-
-    # Split the documents into smaller chunks for the vector store
-    splitter = RecursiveCharacterTextSplitter(
+from utils.pdf_utils import extract_page_texts, open_pdf
+
+# --- Extraction Settings ---
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "64"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "32"))
+
+_extract_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_extract_pool() -> ProcessPoolExecutor:
+    """Shared worker processes for page extraction (PyMuPDF holds the GIL)."""
+    global _extract_pool
+    if _extract_pool is None:
+        with _pool_lock:
+            if _extract_pool is None:
+                _extract_pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _extract_pool
+
+def get_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=100,
         length_function=len,
+        add_start_index=True,  # lets the context packer merge overlapping neighbours
     )
-    chunks = splitter.split_documents(documents)
-    
-    # Clean up the temporary file
+
+def iter_pdf_pages(source: Union[bytes, str], filename: str) -> Iterator[Document]:
+    """
+    Yield one Document per page, in page order, straight from the upload buffer.
+    Large PDFs are split into page ranges extracted in parallel worker
+    processes; pages are yielded as soon as their range is done, with only
+    a bounded number of ranges in flight.
+    """
+    with open_pdf(source) as pdf_doc:
+        page_count = pdf_doc.page_count
+        if PDF_EXTRACT_WORKERS <= 1 or page_count < PDF_PARALLEL_MIN_PAGES:
+            for page_number in range(page_count):
+                text = pdf_doc[page_number].get_text()
+                yield Document(page_content=text, metadata={"source": filename, "page": page_number})
+            return
+
+    # Enough tasks to keep every worker busy, but large enough that the
+    # buffer is not re-sent to the workers once per handful of pages.
+    pages_per_task = max(PDF_PAGES_PER_TASK, -(-page_count // (PDF_EXTRACT_WORKERS * 4)))
+    ranges = [(first, min(first + pages_per_task, page_count)) for first in range(0, page_count, pages_per_task)]
+    pool = _get_extract_pool()
+    # Keep only a few ranges in flight so extracted text never piles up in memory
+    max_in_flight = PDF_EXTRACT_WORKERS * 2
+    pending = deque()
+    next_range = 0
     try:
-        os.remove(temp_path)
-    except OSError as e:
-        print(f"Error removing temporary file {temp_path}: {e}")
-        
-    return chunks
\ No newline at end of file
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < max_in_flight:
+                first, last = ranges[next_range]
+                pending.append((first, pool.submit(extract_page_texts, source, first, last)))
+                next_range += 1
+            first, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                yield Document(page_content=text, metadata={"source": filename, "page": first + offset})
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+def page_hash(text: str) -> str:
+    """SHA-256 of a page's extracted text; pages with the same hash split into the same chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _add_ms(timings: Optional[dict], key: str, start: float):
+    if timings is not None:
+        timings[key] = round(timings.get(key, 0.0) + (time.perf_counter() - start) * 1000, 2)
+
+def iter_chunks(
+    source: Union[bytes, str],
+    filename: str,
+    on_page: Optional[Callable[[int], None]] = None,
+    timings: Optional[dict] = None,
+    page_hashes: Optional[List[str]] = None,
+    reuse: Optional[Callable[[Document, str], Optional[List[Document]]]] = None,
+) -> Iterator[Document]:
+    """
+    Stream pages through the splitter; `on_page` gets the running page count.
+    Time spent extracting and splitting is added to `timings` (parse_ms, split_ms).
+    If given, `page_hashes` receives each page's `page_hash`, and `reuse` is
+    asked for a page's chunks (with its hash) before the page is split; pages
+    it returns None for are split as usual.
+    """
+    splitter = get_splitter()
+    pages = iter_pdf_pages(source, filename)
+    pages_parsed = 0
+    while True:
+        start = time.perf_counter()
+        page = next(pages, None)
+        _add_ms(timings, "parse_ms", start)
+        if page is None:
+            break
+        start = time.perf_counter()
+        chunks = None
+        if page_hashes is not None or reuse is not None:
+            digest = page_hash(page.page_content)
+            if page_hashes is not None:
+                page_hashes.append(digest)
+            if reuse is not None:
+                chunks = reuse(page, digest)
+        if chunks is None:
+            chunks = splitter.split_documents([page])
+        _add_ms(timings, "split_ms", start)
+        yield from chunks
+        pages_parsed += 1
+        if on_page:
+            on_page(pages_parsed)
+
+def load_and_split_pdf(
+    file: Union[BytesIO, bytes], filename: str, on_page: Optional[Callable[[int], None]] = None
+) -> List:
+    """
+    Loads an entire PDF and splits it into chunks, entirely in memory.
+    Each chunk carries {'source': filename, 'page': N} metadata (0-based page).
+    If given, `on_page` is called with the number of pages parsed so far.
+    """
+    content = file.getvalue() if isinstance(file, BytesIO) else file
+    return list(iter_chunks(content, filename, on_page=on_page))
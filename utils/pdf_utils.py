@@ -1,11 +1,33 @@
-import fitz  # PyMuPDF
+from typing import List, Union
+
+# PyMuPDF is imported inside the functions: it is slow to import and not needed to start the API
 
 def get_page_count(file):
-    """Get the page count of a PDF file-like object or bytes."""
-    if isinstance(file, bytes):
+    """Get the page count of a PDF file path, bytes or file-like object."""
+    import fitz  # PyMuPDF
+
+    if isinstance(file, str):
+        pdf_doc = fitz.open(file, filetype="pdf")
+    elif isinstance(file, bytes):
         pdf_doc = fitz.open(stream=file, filetype="pdf")
     else:
         pdf_doc = fitz.open(stream=file.read(), filetype="pdf")
     count = pdf_doc.page_count
     pdf_doc.close()
-    return count
\ No newline at end of file
+    return count
+
+def open_pdf(source: Union[bytes, str]):
+    """Open a PDF from in-memory bytes or a file path."""
+    import fitz  # PyMuPDF
+
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+def extract_page_texts(source: Union[bytes, str], first: int, last: int) -> List[str]:
+    """
+    Extract plain text for pages first..last-1.
+    Module-level (and importing only PyMuPDF) so it can run in worker processes.
+    """
+    with open_pdf(source) as pdf_doc:
+        return [pdf_doc[i].get_text() for i in range(first, last)]
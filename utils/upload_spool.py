@@ -0,0 +1,154 @@
+from typing import AsyncIterator, Optional, Tuple
+import tempfile
+import hashlib
+import os
+
+try:
+    from python_multipart import MultipartParser
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart import MultipartParser
+    from multipart.multipart import parse_options_header
+
+# --- Upload Settings ---
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None  # system temp dir by default
+
+# Room for the multipart boundaries and part headers around the PDF itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload grows past the size limit."""
+
+
+def size_limit_message(max_bytes: int = UPLOAD_MAX_BYTES) -> str:
+    return f"Uploads are limited to {max_bytes / (1024 * 1024):.1f} MB."
+
+
+class SpooledUpload:
+    """
+    An upload body written chunk by chunk to a temp file and hashed on the
+    way, so it is never held in memory as a whole. The parser opens the file
+    by path: PyMuPDF reads pages from it on demand, and extraction worker
+    processes open it themselves instead of being sent the bytes.
+    Call `close()` to delete the file.
+    """
+
+    def __init__(self, max_bytes: int = UPLOAD_MAX_BYTES, directory: Optional[str] = UPLOAD_SPOOL_DIR):
+        fd, self.path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self._hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.content_hash: Optional[str] = None  # set by finish()
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(size_limit_message(self.max_bytes))
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self) -> "SpooledUpload":
+        """Flush the file and fix the SHA-256 of its content."""
+        self._file.close()
+        self.content_hash = self._hash.hexdigest()
+        return self
+
+    def close(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _MultipartSpooler:
+    """python-multipart callbacks that write the data of one file field to a SpooledUpload."""
+
+    CALLBACKS = (
+        "on_part_begin", "on_header_field", "on_header_value", "on_header_end",
+        "on_headers_finished", "on_part_data", "on_part_end",
+    )
+
+    def __init__(self, upload: SpooledUpload, field: str):
+        self.upload = upload
+        self.field = field.encode("utf-8")
+        self.filename: Optional[str] = None
+        self.found = False
+        self._in_file = False
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def on_part_begin(self):
+        self._disposition = b""
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if not self.found and options.get(b"name") == self.field and b"filename" in options:
+            self.found = self._in_file = True
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.upload.write(data[start:end])
+
+    def on_part_end(self):
+        self._in_file = False
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Spool a raw request body (the PDF itself) as it arrives."""
+    upload = SpooledUpload(max_bytes)
+    try:
+        async for chunk in chunks:
+            upload.write(chunk)
+    except BaseException:
+        upload.close()
+        raise
+    return upload.finish()
+
+
+async def spool_multipart(
+    chunks: AsyncIterator[bytes], content_type: str, field: str = "file", max_bytes: int = UPLOAD_MAX_BYTES
+) -> Tuple[SpooledUpload, Optional[str]]:
+    """
+    Parse a multipart/form-data body as it arrives and spool the data of its
+    `field` file part; other parts are skipped. Returns the upload and the
+    part's filename. Raises UploadTooLarge while receiving, and ValueError
+    if the body has no such file part.
+    """
+    upload = SpooledUpload(max_bytes)
+    spooler = _MultipartSpooler(upload, field)
+    try:
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise ValueError("The multipart body has no boundary.")
+        parser = MultipartParser(boundary, {name: getattr(spooler, name) for name in spooler.CALLBACKS})
+        received = 0
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes + MULTIPART_OVERHEAD_BYTES:
+                raise UploadTooLarge(size_limit_message(max_bytes))
+            parser.write(chunk)
+        parser.finalize()
+        if not spooler.found:
+            raise ValueError(f"The upload has no '{field}' file.")
+    except BaseException:
+        upload.close()
+        raise
+    return upload.finish(), spooler.filename